@@ -0,0 +1,195 @@
+"""
+Benchmark the stages of the QR code generation.
+
+Every stage is timed separately over the logos in `test/svg` and a sweep of
+error correction levels and data lengths (and so QR versions). The results are
+written as JSON so they can be compared between releases with `--compare`.
+"""
+
+import json
+import platform
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
+from collections.abc import Callable
+from importlib.metadata import version
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from qrSVG.containers import CorrectionLevel, Offset
+from qrSVG.image import data2tree, svg2pil
+from qrSVG.logo import Logo
+from qrSVG.qr import QR
+
+LOGOS = Path(__file__).parent.with_name("test") / "svg"
+
+
+class Parser(Namespace):
+    output: Path | None
+    compare: Path | None
+    threshold: float
+    repeat: int
+    lengths: list[int]
+    levels: list[CorrectionLevel]
+    logos: list[Path]
+
+
+def measure(stage: Callable[[], object], setup: Callable[[], object], repeat: int) -> dict:
+    """Time a stage, `setup` runs before each call and is not timed."""
+    durations = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        stage()
+        durations.append(time.perf_counter() - start)
+
+    # NOTE: Tracing allocations slows everything down, so memory is measured on a separate run
+    setup()
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean = sum(durations) / len(durations)
+    return {
+        "min": min(durations),
+        "mean": mean,
+        "throughput": 1 / mean if mean else None,
+        "peak_bytes": peak,
+    }
+
+
+def benchmark(path: Path, level: CorrectionLevel, length: int, repeat: int, output: Path) -> list[dict]:
+    """Benchmark all the stages for a logo, error correction level and data length."""
+    data = ("https://example.com/" * length)[:length]
+    content = path.read_bytes()
+    qr = QR(data, level)
+    logo = Logo(content, path)
+    size = qr._logo_size(logo.size, 0.3)
+    offset = Offset((qr.size.width - size.width) / 2, (qr.size.height - size.height) / 2)
+    mask = qr._logo_mask(logo, size, offset, blur=1, margin=1)
+
+    def fresh_logo():
+        nonlocal logo
+        logo = Logo(content, path)  # NOTE: A new logo has no cached rasters
+
+    def reset_knockout():
+        qr.knockout[:] = False
+
+    stages = {
+        "data2tree": (lambda: data2tree(data, level), lambda: None),
+        "svg2pil": (lambda: svg2pil(path, int(size.height) + 2, int(size.width) + 2), lambda: None),
+        "_logo_mask": (lambda: qr._logo_mask(logo, size, offset, blur=1, margin=1), fresh_logo),
+        "_mask_logo_intersection": (
+            lambda: qr._mask_logo_intersection(mask, qr._mask_origin(offset, 1)),
+            reset_knockout,
+        ),
+        "save": (lambda: qr.save(output), lambda: None),
+    }
+    case = {"logo": path.name, "error_correction": str(level), "length": length, "version": qr.version}
+    return [{**case, "stage": name, **measure(stage, setup, repeat)} for name, (stage, setup) in stages.items()]
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> bool:
+    """Print the change of the fastest durations, returns False if any stage got slower than `threshold`."""
+    key = ("logo", "error_correction", "length", "stage")
+    previous = {tuple(result[k] for k in key): result for result in baseline}
+    ok = True
+    for result in results:
+        if (old := previous.get(tuple(result[k] for k in key))) is None:
+            continue
+
+        ratio = result["min"] / old["min"]
+        slower = ratio > threshold
+        ok &= not slower
+        case = " ".join(str(result[k]) for k in key)
+        print(f"{case:<60} {ratio:6.2f}x{' SLOWER' if slower else ''}")
+    return ok
+
+
+def main():
+    parser = ArgumentParser(description=__doc__, formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument(
+        *("-o", "--output"),
+        type=Path,
+        metavar="PATH",
+        default=None,
+        help="write the results as JSON to this file",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        metavar="PATH",
+        default=None,
+        help="JSON results of an earlier run to compare with",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        metavar="FLOAT",
+        default=1.2,
+        help="slowdown ratio that fails the comparison (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-r", "--repeat"),
+        type=int,
+        metavar="INT",
+        default=5,
+        help="number of timed runs per stage (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lengths",
+        type=int,
+        nargs="+",
+        metavar="INT",
+        default=[16, 256, 1024],
+        help="lengths of the encoded data (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--levels",
+        type=CorrectionLevel.from_string,
+        nargs="+",
+        metavar="LEVEL",
+        default=list(CorrectionLevel),
+        help="error correction levels (Default: all)",
+    )
+    parser.add_argument(
+        "--logos",
+        type=Path,
+        nargs="+",
+        metavar="SVG",
+        default=sorted(LOGOS.glob("*.svg")),
+        help=f"logos to use (Default: all in {LOGOS})",
+    )
+    args = parser.parse_args(namespace=Parser())
+
+    results = []
+    with TemporaryDirectory() as tmp:
+        for path in args.logos:
+            for level in args.levels:
+                for length in args.lengths:
+                    for result in benchmark(path, level, length, args.repeat, Path(tmp) / "output.svg"):
+                        results.append(result)
+                        print(
+                            f"{result['logo']:<24} {result['error_correction']} {result['length']:>5}"
+                            f" v{result['version']:<3} {result['stage']:<24}"
+                            f" {result['mean'] * 1000:9.3f} ms {result['peak_bytes'] / 1024:10.1f} KiB"
+                        )
+
+    if args.output:
+        report = {
+            "qrSVG": version("qrSVG"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        return 0 if compare(results, baseline, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+"""
+Benchmark the start up of the library and the CLI.
+
+Every case runs in fresh interpreters, the time of an empty interpreter is
+subtracted. The heavy dependencies loaded by each case are listed, so a change
+pulling one of them into a fast path shows up here.
+"""
+
+import json
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
+from pathlib import Path
+
+HEAVY = ("numpy", "PIL", "cairosvg", "cv2", "inquirer", "qrcode", "asyncio")
+
+CASES = {
+    "import qrSVG.vcard": "import qrSVG.vcard",
+    "import qrSVG.cli": "import qrSVG.cli",
+    "import qrSVG.qr": "import qrSVG.qr",
+    "square code": (
+        "from qrSVG.containers import Options, Shape\n"
+        "from qrSVG.qr import render\n"
+        "render('https://example.com', options=Options(shape=Shape.SQUARE))"
+    ),
+    "circle code": "from qrSVG.qr import render\nrender('https://example.com')",
+    "qrsvg --help": "import contextlib, io\nfrom qrSVG.cli import main\n"
+    "with contextlib.suppress(SystemExit), contextlib.redirect_stdout(io.StringIO()):\n    main(['--help'])",
+}
+
+REPORT = f"import sys, json\nprint(json.dumps([name for name in {HEAVY!r} if name in sys.modules]))"
+
+
+class Parser(Namespace):
+    repeat: int
+    output: Path | None
+
+
+def run(code: str) -> tuple[float, list[str]]:
+    """Wall time of a fresh interpreter running `code`, and the heavy modules it loaded."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", f"{code}\n{REPORT}"], capture_output=True, check=True, text=True)
+    return time.perf_counter() - start, json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = ArgumentParser(description=__doc__, formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument(
+        *("-r", "--repeat"),
+        type=int,
+        metavar="INT",
+        default=5,
+        help="number of runs per case, the fastest is kept (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-o", "--output"),
+        type=Path,
+        metavar="PATH",
+        default=None,
+        help="write the results as JSON to this file",
+    )
+    args = parser.parse_args(namespace=Parser())
+
+    empty = min(run("pass")[0] for _ in range(args.repeat))
+    results = []
+    for name, code in CASES.items():
+        runs = [run(code) for _ in range(args.repeat)]
+        duration = min(duration for duration, _ in runs) - empty
+        loaded = runs[0][1]
+        results.append({"case": name, "seconds": duration, "loaded": loaded})
+        print(f"{name:<20} {duration * 1000:8.1f} ms  {' '.join(loaded) or '-'}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
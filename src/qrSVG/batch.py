@@ -0,0 +1,293 @@
+"""
+Generate many QR codes with logos in one run.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, NamedTuple
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from qrSVG.cache import DiskCache, MaskCache, OutputCache
+from qrSVG.containers import CorrectionLevel, Offset, Options, Shape, validate_scale
+from qrSVG.logo import Logo
+from qrSVG.qr import QR, render
+
+
+class Record(NamedTuple):
+    name: str
+    data: str
+    logo: Path | None = None
+
+
+class Job(NamedTuple):
+    data: str
+    logo: Path
+    output: Path | None = None
+    options: Options = Options()
+    id: Any = None
+
+
+class Progress(NamedTuple):
+    done: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Codes generated per second."""
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.done} codes in {self.elapsed:.1f}s ({self.rate:.1f} codes/s)"
+
+
+def read_records(path: Path) -> Iterator[Record]:
+    """
+    Read records from a CSV or JSON-lines file.
+
+    Each record needs a `data` field, and may have a `name` (used as file name)
+    and a `logo` path overriding the logo of the batch.
+    """
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix.lower() == ".csv":
+            rows: Iterable[dict] = csv.DictReader(file)
+        elif path.suffix.lower() in (".jsonl", ".ndjson"):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            raise ValueError(f"Unsupported record format: {path.suffix!r}")
+
+        for index, row in enumerate(rows):
+            logo = row.get("logo")
+            yield Record(
+                name=row.get("name") or f"{index:06d}",
+                data=row["data"],
+                logo=Path(logo) if logo else None,
+            )
+
+
+# NOTE: Options of a job given as JSON values, checked like the command line arguments
+JSON_OPTIONS: dict[str, Callable[[Any], Any]] = {
+    "scale": lambda value: validate_scale(str(value)),
+    "blur": lambda value: float(str(value)),
+    "margin": lambda value: int(str(value)),
+    "error_correction": lambda value: CorrectionLevel.from_string(str(value)),
+    "shape": lambda value: Shape.from_string(str(value)),
+    "offset": lambda value: Offset(*map(float, value)),
+    "precision": lambda value: None if value is None else int(str(value)),
+    "min_margin": lambda value: None if value is None else int(str(value)),
+}
+
+
+def read_job(line: str, options: Options = Options(), logo: Path | None = None) -> Job:  # noqa: B008
+    """
+    Parse a job from a JSON line, e.g. `{"data": "hello", "logo": "logo.svg", "output": "hello.svg"}`.
+
+    An `options` object overrides the default `options` (`{"scale": 0.2, "shape": "square"}`)
+    and an `id` is passed through to the result.
+    """
+    job = json.loads(line)
+    if not isinstance(job, dict):
+        raise ValueError("a job must be a JSON object")
+
+    overrides = job.get("options") or {}
+    if unknown := set(overrides) - set(Options._fields):
+        raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+
+    if (path := job.get("logo") or logo) is None:
+        raise ValueError("no logo")
+
+    output = job.get("output")
+    return Job(
+        data=job["data"],
+        logo=Path(path),
+        output=Path(output) if output else None,
+        options=options._replace(
+            **{key: JSON_OPTIONS.get(key, lambda value: value)(value) for key, value in overrides.items()}
+        ),
+        id=job.get("id"),
+    )
+
+
+def run_jobs(
+    lines: Iterable[str],
+    options: Options = Options(),  # noqa: B008
+    logo: Path | None = None,
+    cache: Path | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Generate a QR code for each JSON line, yielding one result per line.
+
+    Meant for a long lived process fed by a pipeline: logos, masks and rasters stay
+    cached between jobs, the caches of a `cache` directory are only used by the jobs.
+    The SVG is written to the `output` path of the job, or is returned in the result
+    if there is none. A failing job yields an error result and the following jobs
+    still run.
+    """
+    masks, outputs = _open(cache)
+    for line in lines:
+        if not line.strip():
+            continue
+
+        start = time.perf_counter()
+        job: Job | None = None
+        try:
+            job = read_job(line, options, logo)
+            with _caches(masks, outputs):
+                content = render(job.data, job.logo, job.options, outputs)
+            if job.output is not None:
+                job.output.parent.mkdir(parents=True, exist_ok=True)
+                job.output.write_bytes(content)
+        except Exception as e:
+            yield {"id": job.id if job else None, "ok": False, "error": f"{type(e).__name__}: {e}"}
+            continue
+
+        result: dict[str, Any] = {"id": job.id, "ok": True, "seconds": round(time.perf_counter() - start, 6)}
+        if job.output is not None:
+            result["output"] = str(job.output)
+        else:
+            result["svg"] = content.decode()
+        yield result
+
+
+def _filename(name: str) -> str:
+    """Get a safe file name for a record."""
+    name = Path(name).name
+    return name if name.endswith(".svg") else f"{name}.svg"
+
+
+@contextmanager
+def sink(output: Path) -> Iterator[Callable[[str, bytes], None]]:
+    """
+    Write SVG files into a directory, or a zip file if the output ends with `.zip`.
+
+    A file name written twice raises a `ValueError`, instead of replacing the first file.
+    """
+    names: set[str] = set()
+
+    def named(name: str) -> str:
+        if (filename := _filename(name)) in names:
+            raise ValueError(f"Duplicate file name: {filename!r}")
+        names.add(filename)
+        return filename
+
+    if output.suffix.lower() == ".zip":
+        with ZipFile(output, "w", compression=ZIP_DEFLATED) as archive:
+
+            def store(name: str, content: bytes):
+                archive.writestr(named(name), content)
+
+            yield store
+        return
+
+    output.mkdir(parents=True, exist_ok=True)
+
+    def write(name: str, content: bytes):
+        (output / named(name)).write_bytes(content)
+
+    yield write
+
+
+_outputs: OutputCache | None = None
+
+
+def _open(cache: Path | None) -> tuple[MaskCache | None, OutputCache | None]:
+    """Mask and SVG caches of the `cache` directory, none without a directory."""
+    if cache is None:
+        return None, None
+    return MaskCache(directory=cache / "masks"), DiskCache(cache / "svg")
+
+
+@contextmanager
+def _caches(masks: MaskCache | None, outputs: OutputCache | None) -> Iterator[None]:
+    """Use these caches until exit, the current mask cache is kept if `masks` is None."""
+    global _outputs  # noqa: PLW0603
+
+    previous_masks, previous_outputs = QR.mask_cache, _outputs
+    if masks is not None:
+        QR.mask_cache = masks
+    _outputs = outputs
+    try:
+        yield
+    finally:
+        QR.mask_cache = previous_masks
+        _outputs = previous_outputs
+
+
+def warm(logos: tuple[Path, ...], cache: Path | None = None):
+    """Parse the logos and open the caches once when a worker process starts, for its whole life."""
+    global _outputs  # noqa: PLW0603
+
+    masks, outputs = _open(cache)
+    if masks is not None:
+        QR.mask_cache = masks
+    _outputs = outputs
+    for logo in logos:
+        Logo.open(logo)
+
+
+def generate_record(record: Record, logo: Path, options: Options) -> tuple[str, bytes]:
+    """Name and SVG file of a record, with the caches opened by `warm` in worker processes."""
+    return record.name, render(record.data, record.logo or logo, options, _outputs)
+
+
+def generate_many(  # noqa: PLR0913
+    records: Iterable[Record | tuple[str, str]],
+    logo: Path,
+    output: Path,
+    options: Options = Options(),  # noqa: B008
+    workers: int | None = None,
+    progress: Callable[[Progress], None] | None = None,
+    cache: Path | None = None,
+) -> Progress:
+    """
+    Generate a QR code with a logo for each record.
+
+    The SVG files are streamed to the `output` directory, or into a zip file if
+    `output` ends with `.zip`. Work is spread over `workers` processes (default:
+    one per CPU), each logo is parsed and rasterised once per worker. Logo masks
+    and complete SVG files are also shared between workers and runs if a `cache`
+    directory is given.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    done = 0
+
+    def report():
+        nonlocal done
+        done += 1
+        if progress:
+            progress(Progress(done, time.perf_counter() - start))
+
+    with sink(output) as write:
+        if workers == 1:
+            with _caches(*_open(cache)):
+                for record in records:
+                    write(*generate_record(Record(*record), logo, options))
+                    report()
+            return Progress(done, time.perf_counter() - start)
+
+        with ProcessPoolExecutor(workers, initializer=warm, initargs=((logo,), cache)) as pool:
+            # NOTE: Keep a bounded number of jobs in flight so the records are streamed
+            pending: set[Future[tuple[str, bytes]]] = set()
+            for record in records:
+                pending.add(pool.submit(generate_record, Record(*record), logo, options))
+                if len(pending) < 4 * workers:
+                    continue
+
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(*future.result())
+                    report()
+
+            for future in wait(pending).done:
+                write(*future.result())
+                report()
+
+    return Progress(done, time.perf_counter() - start)
@@ -0,0 +1,246 @@
+"""
+Caches for intermediate results of the QR code generation.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import TYPE_CHECKING, NamedTuple
+
+from qrSVG.containers import Offset, Options, Size
+from qrSVG.lazy import Lazy
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = Lazy("numpy")
+
+FORMAT = 2  # NOTE: Bump when the generated output changes, to invalidate cached SVG files
+MASK_FORMAT = 2  # NOTE: Bump when the masks change, to invalidate the cached masks
+
+
+class MaskKey(NamedTuple):
+    logo: str  # content hash of the logo
+    size: Size
+    blur: float
+    margin: int
+    version: int
+
+    def digest(self) -> str:
+        """Stable name for the key, used for the files on disk."""
+        return sha256(repr((MASK_FORMAT, *self)).encode()).hexdigest()
+
+
+class MaskCache:
+    """
+    Least recently used cache of logo masks.
+
+    Masks are boolean arrays covering the logo, kept in memory and, if a directory
+    is given, also stored as `.npy` files so they survive between processes and runs.
+    """
+
+    def __init__(self, maxsize: int = 128, directory: Path | None = None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._masks: OrderedDict[MaskKey, np.ndarray] = OrderedDict()
+
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+    def get(self, key: MaskKey) -> np.ndarray | None:
+        """Get a mask, or None if it has not been cached."""
+        if (mask := self._masks.get(key)) is not None:
+            self._masks.move_to_end(key)
+            return mask
+
+        if self.directory is None:
+            return None
+
+        try:
+            mask = np.load(self.directory / f"{key.digest()}.npy")
+        except (FileNotFoundError, ValueError):
+            return None
+
+        self._remember(key, mask)
+        return mask
+
+    def put(self, key: MaskKey, mask: np.ndarray):
+        """Cache a mask."""
+        self._remember(key, mask)
+
+        if self.directory is None:
+            return
+
+        # NOTE: Write to a temporary file first so concurrent readers never see partial files
+        with NamedTemporaryFile(dir=self.directory, suffix=".npy", delete=False) as tmp:
+            np.save(tmp, mask)
+        os.replace(tmp.name, self.directory / f"{key.digest()}.npy")
+
+    def clear(self):
+        """Empty the in-memory cache."""
+        self._masks.clear()
+
+    def _remember(self, key: MaskKey, mask: np.ndarray):
+        mask.flags.writeable = False
+        self._masks[key] = mask
+        self._masks.move_to_end(key)
+        while len(self._masks) > self.maxsize:
+            self._masks.popitem(last=False)
+
+
+def output_key(data: str, logo: str | None, options: Options) -> str:
+    """Stable digest of everything that defines a generated SVG file, `logo` is its content hash."""
+    fields = [FORMAT, data, logo, *options._replace(offset=Offset(*options.offset))]
+    return sha256(json.dumps(fields, default=str).encode()).hexdigest()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    size: int
+
+    @property
+    def ratio(self) -> float:
+        """Share of the lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class OutputCache(ABC):
+    """
+    Base of the caches for complete SVG files, keyed by `output_key`.
+
+    Subclasses implement `_get`, `put` and `stats`, lookups are counted here.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> bytes | None:
+        """Get a cached SVG file, or None if it has not been cached."""
+        if (content := self._get(key)) is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    @abstractmethod
+    def put(self, key: str, content: bytes):
+        """Cache an SVG file."""
+
+    @abstractmethod
+    def stats(self) -> CacheStats: ...
+
+    @abstractmethod
+    def _get(self, key: str) -> bytes | None: ...
+
+
+class MemoryCache(OutputCache):
+    """Least recently used cache of SVG files, holding at most `max_bytes`."""
+
+    def __init__(self, max_bytes: int = 64 << 20):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._files: OrderedDict[str, bytes] = OrderedDict()
+
+    def put(self, key: str, content: bytes):
+        if (previous := self._files.pop(key, None)) is not None:
+            self._size -= len(previous)
+
+        self._files[key] = content
+        self._size += len(content)
+        while self._size > self.max_bytes:
+            _, evicted = self._files.popitem(last=False)
+            self._size -= len(evicted)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, len(self._files), self._size)
+
+    def _get(self, key: str) -> bytes | None:
+        if (content := self._files.get(key)) is not None:
+            self._files.move_to_end(key)
+        return content
+
+
+class DiskCache(OutputCache):
+    """
+    Cache of SVG files in a directory, sharded by the first characters of the key.
+
+    The least recently used files are evicted when the directory holds more than
+    `max_bytes`. The directory can be shared between processes.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 1 << 30):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._files())
+
+    def put(self, key: str, content: bytes):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        try:
+            previous = path.stat().st_size
+        except FileNotFoundError:
+            previous = 0
+
+        # NOTE: Write to a temporary file first so concurrent readers never see partial files
+        with NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp:
+            tmp.write(content)
+        os.replace(tmp.name, path)
+
+        self._size += len(content) - previous
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def stats(self) -> CacheStats:
+        files = list(self._files())
+        return CacheStats(self.hits, self.misses, len(files), sum(size for _, size, _ in files))
+
+    def _get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)  # NOTE: The modification time tracks the last use
+        except FileNotFoundError:
+            return None
+        return content
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.svg"
+
+    def _files(self):
+        """Path, size and last use of the cached files."""
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".svg"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """Remove the least recently used files, down to 90% of the maximum size."""
+        files = sorted(self._files(), key=lambda file: file[2])
+        self._size = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._size <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
@@ -1,14 +1,23 @@
 import re
+import sys
 from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
+from contextlib import nullcontext
 from importlib.metadata import version
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import inquirer
-
-from qrSVG.containers import CorrectionLevel, Offset
-from qrSVG.qr import QR
+from qrSVG.cache import DiskCache, MaskCache
+from qrSVG.containers import PIXELS, UNIT, CorrectionLevel, Offset, Options, Shape, validate_scale
+from qrSVG.lazy import Lazy
+from qrSVG.profile import Profile, listen
+from qrSVG.qr import QR, RASTER_FORMATS, generate, render
 from qrSVG.vcard import VCard
 
+if TYPE_CHECKING:
+    import inquirer
+else:
+    inquirer = Lazy("inquirer")  # NOTE: Only needed without data on the command line
+
 
 class Parser(Namespace):
     logo: Path
@@ -19,13 +28,31 @@ class Parser(Namespace):
     margin: int
     offset: tuple[float, float]
     error_correction: CorrectionLevel
-
-
-def validate_scale(value: str) -> float:
-    _value = float(value)
-    if 0.0 < _value <= 1.0:
-        return _value
-    raise ValueError("scale must be between 0 and 1")
+    shape: Shape
+    compact: bool
+    precision: int | None
+    cache: Path | None
+    min_margin: int | None
+    unit: str
+    profile: bool
+    auto_scale: bool
+    size: list[int] | None
+    dpi: float | None
+
+    def options(self) -> Options:
+        """Generation options from the arguments."""
+        return Options(
+            self.scale,
+            self.blur,
+            self.margin,
+            Offset(*self.offset),
+            self.error_correction,
+            self.shape,
+            self.compact,
+            self.precision,
+            self.min_margin,
+            self.unit,
+        )
 
 
 DESCRIPTION = rf"""
@@ -60,7 +87,94 @@ the logo before use.
 \b"""
 
 
-def main():
+def add_code_arguments(parser: ArgumentParser):
+    """Arguments controlling how the QR code and logo are drawn."""
+    parser.add_argument(
+        *("-s", "--scale"),
+        type=validate_scale,
+        default=0.3,
+        metavar="FLOAT",
+        help="logo relative to the QR code. (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-b", "--blur"),
+        type=float,
+        metavar="FLOAT",
+        default=1,
+        help="get less dots inside the logo if logo has transparent elements. (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-m", "--margin"),
+        type=int,
+        default=0,
+        metavar="INT",
+        help="add margin around the logo.",
+    )
+    parser.add_argument(
+        *("-c", "--correct"),
+        type=float,
+        default=(0.0, 0.0),
+        nargs=2,
+        metavar=("X", "Y"),
+        dest="offset",
+        help="correction of the logo position. (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-e", "--error-correction"),
+        type=CorrectionLevel.from_string,
+        choices=list(CorrectionLevel),
+        default="H",
+        help="level of error correction to use (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--shape",
+        type=Shape.from_string,
+        choices=list(Shape),
+        default="circle",
+        help="shape of the modules (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="write a minified SVG, drawing the modules as paths",
+    )
+    parser.add_argument(
+        "--unit",
+        choices=[unit for unit in PIXELS if unit != "%"],
+        default=UNIT,
+        help="unit of the document, one module being one unit (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--precision",
+        type=int,
+        metavar="INT",
+        default=None,
+        help="maximum number of decimals for the logo position and size",
+    )
+    parser.add_argument(
+        "--min-margin",
+        type=int,
+        metavar="INT",
+        default=None,
+        help="shrink the logo until this many codewords per error correction block are left to spare",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        metavar="DIR",
+        default=None,
+        help="directory to keep logo masks and generated SVG files in between runs",
+    )
+
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    if "--stdin-jsonl" in argv:
+        return jobs(argv)
+
     parser = ArgumentParser(
         description=DESCRIPTION,
         epilog=EPILOG,
@@ -84,50 +198,435 @@ def main():
         type=Path,
         metavar="PATH",
         default=Path.cwd() / "output.svg",
-        help="output file path (Default; %(default)s)",
+        help="output file path, a .png or .webp extension writes an image (Default; %(default)s)",
     )
     parser.add_argument(
-        *("-s", "--scale"),
-        type=validate_scale,
-        default=0.3,
-        metavar="FLOAT",
-        help="logo relative to the QR code. (Default: %(default)s)",
+        "--size",
+        type=int,
+        nargs="+",
+        metavar="INT",
+        default=None,
+        help="width of the image in pixels, several sizes are written as PATH-SIZE.png",
     )
     parser.add_argument(
-        *("-b", "--blur"),
+        "--dpi",
         type=float,
         metavar="FLOAT",
-        default=1,
-        help="get less dots inside the logo if logo has transparent elements. (Default: %(default)s)",
+        default=None,
+        help="resolution of the image, one module being one --unit, without --size (Default: 300)",
     )
     parser.add_argument(
-        *("-m", "--margin"),
+        "--profile",
+        action="store_true",
+        help="print the time spent in each stage of the generation",
+    )
+    parser.add_argument(
+        "--stdin-jsonl",
+        action="store_true",
+        help="read jobs as JSON lines from stdin, write one result per line (see `qrsvg --stdin-jsonl -h`)",
+    )
+    parser.add_argument(
+        "--auto-scale",
+        action="store_true",
+        help="use the largest logo scale that still decodes, instead of --scale",
+    )
+    add_code_arguments(parser)
+    args = parser.parse_args(argv, namespace=Parser())
+    if args.output.suffix.lower() not in RASTER_FORMATS and (args.size or args.dpi):
+        parser.error("--size and --dpi only apply to .png and .webp outputs")
+
+    cache = None
+    if args.cache is not None:
+        QR.mask_cache = MaskCache(directory=args.cache / "masks")
+        cache = DiskCache(args.cache / "svg")
+
+    data = args.data or interactive()
+    if args.auto_scale:
+        from qrSVG.validate import optimize_logo  # NOTE: Needs the optional validation dependencies
+
+        options = args.options()
+        found = optimize_logo(
+            data,
+            args.logo,
+            options.error_correction,
+            options.shape,
+            options.blur,
+            options.margin,
+            options.offset,
+            min_margin=options.min_margin or 0,
+        )
+        args.scale = found.scale
+        print(f"scale {found.scale:.3f}, {found.damage}", file=sys.stderr)
+
+    profile = Profile()
+    with listen(profile) if args.profile else nullcontext():
+        if args.output.suffix.lower() not in RASTER_FORMATS:
+            args.output.write_bytes(render(data, args.logo, args.options(), cache))
+        elif args.size and len(args.size) > 1:
+            qr = generate(data, args.logo, args.options())
+            for size in args.size:
+                qr.save(args.output.with_stem(f"{args.output.stem}-{size}"), size=size)
+        else:
+            qr = generate(data, args.logo, args.options())
+            qr.save(args.output, size=args.size[0] if args.size else None, dpi=args.dpi)
+
+    if args.profile:
+        print(profile, file=sys.stderr)
+
+
+class BatchParser(Parser):
+    records: Path
+    workers: int | None
+    quiet: bool
+
+
+def batch(argv: list[str]):
+    """Generate a QR code for each record of a CSV or JSON-lines file."""
+    from qrSVG.batch import Progress, generate_many, read_records
+
+    parser = ArgumentParser(
+        prog="qrsvg batch",
+        description=batch.__doc__,
+        formatter_class=RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "logo",
+        type=Path,
+        metavar="SVG",
+        help="file path to the SVG logo to add",
+    )
+    parser.add_argument(
+        "records",
+        type=Path,
+        metavar="RECORDS",
+        help="CSV or JSON-lines file with `data` and optional `name` and `logo` fields",
+    )
+    parser.add_argument(
+        *("-o", "--output"),
+        type=Path,
+        metavar="PATH",
+        default=Path.cwd() / "output",
+        help="output directory, or zip file if it ends with .zip (Default; %(default)s)",
+    )
+    parser.add_argument(
+        *("-w", "--workers"),
         type=int,
-        default=0,
         metavar="INT",
-        help="add margin around the logo.",
+        default=None,
+        help="number of worker processes (Default: one per CPU)",
     )
     parser.add_argument(
-        *("-c", "--correct"),
+        *("-q", "--quiet"),
+        action="store_true",
+        help="do not report progress",
+    )
+    add_code_arguments(parser)
+    args = parser.parse_args(argv, namespace=BatchParser())
+
+    def report(progress: Progress):
+        print(f"\r{progress}", end="", file=sys.stderr, flush=True)
+
+    summary = generate_many(
+        read_records(args.records),
+        args.logo,
+        args.output,
+        args.options(),
+        workers=args.workers,
+        progress=None if args.quiet else report,
+        cache=args.cache,
+    )
+    if not args.quiet:
+        print(f"\r{summary}", file=sys.stderr)
+
+
+class ContactsParser(BatchParser):
+    contacts: Path
+    column: list[str]
+    rev: bool
+
+
+def contacts(argv: list[str]):
+    """Generate a vCard QR code for each contact of a CSV or LDIF export."""
+    from datetime import UTC, datetime
+
+    from qrSVG.batch import Progress, generate_many
+    from qrSVG.contacts import FIELDS, read_contacts
+
+    parser = ArgumentParser(
+        prog="qrsvg contacts",
+        description=contacts.__doc__,
+        formatter_class=RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "logo",
+        type=Path,
+        metavar="SVG",
+        help="file path to the SVG logo to add",
+    )
+    parser.add_argument(
+        "contacts",
+        type=Path,
+        metavar="CONTACTS",
+        help="CSV file with a header, or LDIF file",
+    )
+    parser.add_argument(
+        *("-o", "--output"),
+        type=Path,
+        metavar="PATH",
+        default=Path.cwd() / "contacts",
+        help="output directory, or zip file if it ends with .zip (Default; %(default)s)",
+    )
+    parser.add_argument(
+        "--column",
+        action="append",
+        metavar="COLUMN=FIELD",
+        default=[],
+        help=f"read a field from another CSV column, fields: {', '.join(FIELDS)}",
+    )
+    parser.add_argument(
+        "--rev",
+        action="store_true",
+        help="stamp the cards with the current time, they are identical between runs otherwise",
+    )
+    parser.add_argument(
+        *("-w", "--workers"),
+        type=int,
+        metavar="INT",
+        default=None,
+        help="number of worker processes (Default: one per CPU)",
+    )
+    parser.add_argument(
+        *("-q", "--quiet"),
+        action="store_true",
+        help="do not report progress",
+    )
+    add_code_arguments(parser)
+    args = parser.parse_args(argv, namespace=ContactsParser())
+    try:
+        columns = dict(column.split("=", 1) for column in args.column)
+    except ValueError:
+        parser.error("--column must be COLUMN=FIELD")
+
+    def report(progress: Progress):
+        print(f"\r{progress}", end="", file=sys.stderr, flush=True)
+
+    summary = generate_many(
+        read_contacts(args.contacts, columns, rev=datetime.now(UTC) if args.rev else False),
+        args.logo,
+        args.output,
+        args.options(),
+        workers=args.workers,
+        progress=None if args.quiet else report,
+        cache=args.cache,
+    )
+    if not args.quiet:
+        print(f"\r{summary}", file=sys.stderr)
+
+
+class JobsParser(Parser):
+    default_logo: Path | None
+
+
+def jobs(argv: list[str]):
+    """
+    Generate QR codes for the JSON lines read from stdin, in one long lived process.
+
+    Each line is a job, e.g. {"data": "hello", "logo": "logo.svg", "output": "hello.svg"},
+    with optional "options" overriding the arguments ({"scale": 0.2, "shape": "square"})
+    and an "id" passed through. One JSON line is written to stdout per job, in order,
+    with "ok" and either "output", the SVG as "svg" or an "error".
+    """
+    import json
+
+    from qrSVG.batch import run_jobs
+
+    parser = ArgumentParser(
+        prog="qrsvg",
+        description=jobs.__doc__,
+        formatter_class=RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "default_logo",
+        type=Path,
+        metavar="SVG",
+        nargs="?",
+        default=None,
+        help="default logo of the jobs without one",
+    )
+    parser.add_argument(
+        "--stdin-jsonl",
+        action="store_true",
+        required=True,
+        help="read the jobs from stdin",
+    )
+    add_code_arguments(parser)
+    args = parser.parse_args(argv, namespace=JobsParser())
+
+    for result in run_jobs(sys.stdin, args.options(), args.default_logo, args.cache):
+        print(json.dumps(result), flush=True)
+
+
+class SheetParser(Parser):
+    records: Path
+    page: str
+    columns: int
+    rows: int
+    page_margin: float
+    gap: float
+    quiet: bool
+
+
+def sheet(argv: list[str]):
+    """Lay out a QR code for each record of a CSV or JSON-lines file on N-up print pages."""
+    from qrSVG.batch import read_records
+    from qrSVG.sheet import PAGES, Layout, write_sheet
+
+    parser = ArgumentParser(
+        prog="qrsvg sheet",
+        description=sheet.__doc__,
+        formatter_class=RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "logo",
+        type=Path,
+        metavar="SVG",
+        help="file path to the SVG logo to add",
+    )
+    parser.add_argument(
+        "records",
+        type=Path,
+        metavar="RECORDS",
+        help="CSV or JSON-lines file with `data` and optional `logo` fields",
+    )
+    parser.add_argument(
+        *("-o", "--output"),
+        type=Path,
+        metavar="PATH",
+        default=Path.cwd() / "sheet.pdf",
+        help="PDF file, or directory (zip file if it ends with .zip) of SVG pages (Default; %(default)s)",
+    )
+    parser.add_argument(
+        "--page",
+        choices=list(PAGES),
+        default="a4",
+        help="page size (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--columns",
+        type=int,
+        metavar="INT",
+        default=Layout().columns,
+        help="codes per row (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        metavar="INT",
+        default=Layout().rows,
+        help="rows of codes per page (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "--page-margin",
         type=float,
-        default=(0.0, 0.0),
-        nargs=2,
-        metavar=("X", "Y"),
-        dest="offset",
-        help="correction of the logo position. (Default: %(default)s)",
+        metavar="MM",
+        default=Layout().margin,
+        help="margin around the grid, in mm (Default: %(default)s)",
     )
     parser.add_argument(
-        *("-e", "--error-correction"),
-        type=CorrectionLevel.from_string,
-        choices=list(CorrectionLevel),
-        default="H",
-        help="level of error correction to use (Default: %(default)s)",
+        "--gap",
+        type=float,
+        metavar="MM",
+        default=Layout().gap,
+        help="space between the codes, in mm (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-q", "--quiet"),
+        action="store_true",
+        help="do not report the number of codes and pages",
+    )
+    add_code_arguments(parser)
+    args = parser.parse_args(argv, namespace=SheetParser())
+    if args.cache is not None:
+        QR.mask_cache = MaskCache(directory=args.cache / "masks")
+
+    options = args.options()
+    codes = (generate(record.data, record.logo or args.logo, options) for record in read_records(args.records))
+    layout = Layout(*PAGES[args.page], args.columns, args.rows, args.page_margin, args.gap)
+    summary = write_sheet(codes, args.output, layout)
+    if not args.quiet:
+        print(summary, file=sys.stderr)
+
+
+class ServeParser(Parser):
+    logos: list[Path]
+    host: str
+    port: int
+    workers: int | None
+    max_pending: int | None
+
+
+def serve(argv: list[str]):
+    """Generate QR codes on demand over HTTP, GET /qr?data=...&logo=NAME and GET /metrics."""
+    import asyncio
+
+    from qrSVG.serve import Service
+    from qrSVG.serve import serve as run_service
+
+    parser = ArgumentParser(
+        prog="qrsvg serve",
+        description=serve.__doc__,
+        formatter_class=RawDescriptionHelpFormatter,
     )
-    args = parser.parse_args(namespace=Parser())
+    parser.add_argument(
+        "logos",
+        type=Path,
+        nargs="+",
+        metavar="SVG",
+        help="logos to preload, named by their file name without extension, the first is the default",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-p", "--port"),
+        type=int,
+        metavar="INT",
+        default=8000,
+        help="port to listen on (Default: %(default)s)",
+    )
+    parser.add_argument(
+        *("-w", "--workers"),
+        type=int,
+        metavar="INT",
+        default=None,
+        help="number of worker processes (Default: one per CPU)",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        metavar="INT",
+        default=None,
+        help="generations in flight before requests are refused (Default: 8 per worker)",
+    )
+    add_code_arguments(parser)
+    args = parser.parse_args(argv, namespace=ServeParser())
+
+    service = Service(args.logos, args.options(), args.workers, args.max_pending, args.cache)
+    print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(run_service(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
 
-    qr = QR(args.data or interactive(), args.error_correction)
-    qr.add_logo(args.logo, args.scale, args.blur, args.margin, Offset(*args.offset))
-    qr.save(args.output)
+COMMANDS = {
+    "batch": batch,
+    "contacts": contacts,
+    "serve": serve,
+    "sheet": sheet,
+}
 
 
 def url_validator(x):
@@ -0,0 +1,175 @@
+"""
+Map the modules of a QR code to its codewords and Reed-Solomon blocks.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple
+
+from qrSVG.containers import CorrectionLevel
+from qrSVG.image import BORDER
+from qrSVG.lazy import Lazy
+
+if TYPE_CHECKING:
+    import numpy as np
+    from qrcode.main import QRCode
+else:
+    np = Lazy("numpy")
+
+# NOTE: Misdecode protection codewords (p in ISO/IEC 18004 table 9), error correction
+# codewords of the smallest versions that only detect errors, by version and level
+PROTECTION = {
+    (1, CorrectionLevel.L): 3,
+    (1, CorrectionLevel.M): 2,
+    (1, CorrectionLevel.Q): 1,
+    (1, CorrectionLevel.H): 1,
+    (2, CorrectionLevel.L): 2,
+    (3, CorrectionLevel.L): 1,
+}
+
+
+def _empty(version: int) -> QRCode:
+    """Code of the version without any module set (border excluded), to set up its patterns on."""
+    from qrcode.main import QRCode
+
+    code = QRCode(version=version, border=0)
+    code.modules_count = count = version * 4 + 17
+    code.modules = [[None] * count for _ in range(count)]
+    for row, col in ((0, 0), (count - 7, 0), (0, count - 7)):
+        code.setup_position_probe_pattern(row, col)
+    return code
+
+
+def _set(code: QRCode) -> np.ndarray:
+    return np.array([[module is not None for module in row] for row in code.modules])
+
+
+@lru_cache(maxsize=64)
+def function_patterns(version: int) -> np.ndarray:
+    """2D mask of the modules (border excluded) that do not hold data: finder, timing, alignment and format."""
+    code = _empty(version)
+    code.setup_position_adjust_pattern()
+    code.setup_timing_pattern()
+    code.setup_type_info(test=True, mask_pattern=0)
+    if version >= 7:  # noqa: PLR2004
+        code.setup_type_number(test=True)
+
+    function = _set(code)
+    function.flags.writeable = False
+    return function
+
+
+@lru_cache(maxsize=64)
+def sampling_patterns(version: int) -> np.ndarray:
+    """2D mask of the timing and alignment patterns (border excluded), a reader needs them to sample the modules."""
+    code = _empty(version)
+    finders = _set(code)
+    code.setup_position_adjust_pattern()
+    code.setup_timing_pattern()
+
+    sampling = _set(code) & ~finders
+    sampling.flags.writeable = False
+    return sampling
+
+
+@lru_cache(maxsize=64)
+def placement(version: int) -> np.ndarray:
+    """Index of the data bit held by every module (border excluded), -1 for the function patterns."""
+    function = function_patterns(version)
+    count = len(function)
+    bits = np.full((count, count), -1, dtype=np.int32)
+
+    # NOTE: Same zigzag as `QRCode.map_data`, two columns at a time from the bottom right
+    bit, row, step = 0, count - 1, -1
+    for right in range(count - 1, 0, -2):
+        right -= right <= 6  # noqa: PLR2004, PLW2901
+        while 0 <= row < count:
+            for col in (right, right - 1):
+                if not function[row, col]:
+                    bits[row, col] = bit
+                    bit += 1
+            row += step
+        row -= step
+        step = -step
+
+    bits.flags.writeable = False
+    return bits
+
+
+@lru_cache(maxsize=64)
+def layout(version: int, error_correction: CorrectionLevel) -> tuple[np.ndarray, np.ndarray, tuple[int, ...]]:
+    """
+    Codeword of every module, block of every codeword and error correction codewords of every block.
+
+    Modules (border excluded) that hold no codeword are -1.
+    """
+    from qrcode.base import rs_blocks
+
+    bits = placement(version)
+    codewords = np.where(bits >= 0, bits // 8, -1)
+
+    blocks = rs_blocks(version, error_correction.value)
+    data = [block.data_count for block in blocks]
+    correction = [block.total_count - block.data_count for block in blocks]
+
+    # NOTE: Codewords are interleaved, data codewords of all blocks first, then correction codewords
+    owners = [index for i in range(max(data)) for index, size in enumerate(data) if i < size]
+    owners += [index for i in range(max(correction)) for index, size in enumerate(correction) if i < size]
+
+    codewords[codewords >= len(owners)] = -1  # NOTE: Remainder bits
+    codewords.flags.writeable = False
+    return codewords, np.array(owners), tuple(correction)
+
+
+class Damage(NamedTuple):
+    damaged: tuple[int, ...]  # wrong codewords per block
+    correction: tuple[int, ...]  # error correction codewords per block
+    function: int = 0  # wrong modules of the timing and alignment patterns
+    protection: int = 0  # correction codewords per block only detecting errors (see `PROTECTION`)
+
+    @property
+    def capacity(self) -> tuple[int, ...]:
+        """
+        Wrong codewords each block can correct.
+
+        A reader does not know which modules are wrong, so they are errors and
+        not erasures, which would only cost one correction codeword each.
+        """
+        return tuple((correction - self.protection) // 2 for correction in self.correction)
+
+    @property
+    def margin(self) -> int:
+        """Codewords that can still be damaged in the weakest block, negative if it cannot be decoded."""
+        return min(capacity - damaged for damaged, capacity in zip(self.damaged, self.capacity, strict=True))
+
+    def budget(self) -> list[tuple[float, float]]:
+        """Share of the erasure and of the error budget used by each block."""
+        return [
+            (damaged / (correction - self.protection), damaged / capacity)
+            for damaged, correction, capacity in zip(self.damaged, self.correction, self.capacity, strict=True)
+        ]
+
+    def __str__(self) -> str:
+        blocks = " ".join(f"{d}/{c}" for d, c in zip(self.damaged, self.capacity, strict=True))
+        return f"{self.margin} codewords to spare (damaged per block: {blocks})"
+
+
+def damage(
+    modules: np.ndarray,
+    version: int,
+    error_correction: CorrectionLevel,
+    border: int = BORDER,
+) -> Damage:
+    """
+    Codewords per block damaged by the `modules` (border included) set, the modules read wrong.
+
+    Only the layout of the version is used, nothing is decoded. `QR.damage` reads the
+    modules from an image of the code, `QR.add_logo` only from its knockout.
+    """
+    codewords, owners, correction = layout(version, error_correction)
+    inner = modules[border : len(modules) - border, border : len(modules) - border]
+    hit = np.unique(codewords[inner & (codewords >= 0)])
+    damaged = np.bincount(owners[hit], minlength=len(correction))
+    function = int((inner & sampling_patterns(version)).sum())
+    return Damage(tuple(damaged.tolist()), correction, function, PROTECTION.get((version, error_correction), 0))
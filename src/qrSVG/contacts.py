@@ -0,0 +1,207 @@
+"""
+Import contacts from CSV or LDIF exports as vCards, one at a time.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from base64 import b64decode
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from datetime import datetime
+from pathlib import Path
+from typing import TextIO
+
+from qrSVG.batch import Record
+from qrSVG.vcard import VCard
+
+ADDRESS = ("street", "city", "state", "zip", "country")
+
+# NOTE: Fields of a contact, as the `VCard` methods adding them
+FIELDS = (
+    "name",
+    "surname",
+    "email",
+    "work_phone",
+    "home_phone",
+    "organization",
+    "title",
+    "url",
+    "note",
+    *(f"work_{part}" for part in ADDRESS),
+    *(f"home_{part}" for part in ADDRESS),
+)
+
+# NOTE: Other usual names of CSV columns, compared in lowercase with underscores for spaces and dashes
+COLUMNS = {
+    "first_name": "name",
+    "given_name": "name",
+    "last_name": "surname",
+    "family_name": "surname",
+    "mail": "email",
+    "e_mail": "email",
+    "email_address": "email",
+    "phone": "work_phone",
+    "business_phone": "work_phone",
+    "mobile": "home_phone",
+    "mobile_phone": "home_phone",
+    "company": "organization",
+    "job_title": "title",
+    "website": "url",
+    "web_page": "url",
+    "notes": "note",
+    "business_street": "work_street",
+    "business_city": "work_city",
+    "business_state": "work_state",
+    "business_postal_code": "work_zip",
+    "business_country": "work_country",
+    "home_postal_code": "home_zip",
+}
+
+# NOTE: LDAP attributes (inetOrgPerson and the Mozilla address book), in lowercase
+LDIF = {
+    "givenname": "name",
+    "sn": "surname",
+    "mail": "email",
+    "telephonenumber": "work_phone",
+    "homephone": "home_phone",
+    "mobile": "home_phone",
+    "o": "organization",
+    "title": "title",
+    "labeleduri": "url",
+    "mozillaworkurl": "url",
+    "description": "note",
+    "street": "work_street",
+    "l": "work_city",
+    "st": "work_state",
+    "postalcode": "work_zip",
+    "c": "work_country",
+    "mozillahomestreet": "home_street",
+    "mozillahomelocalityname": "home_city",
+    "mozillahomestate": "home_state",
+    "mozillahomepostalcode": "home_zip",
+    "mozillahomecountryname": "home_country",
+}
+
+
+def vcard(fields: Mapping[str, str], rev: datetime | bool = False) -> VCard:
+    """vCard of a contact, empty fields are left out and an address needs any of its fields."""
+    card = VCard(fields.get("name", ""), fields.get("surname", ""), rev=rev)
+    add: Callable[..., None]
+    for field, add in (
+        ("organization", card.add_organization),
+        ("title", card.add_title),
+        ("work_phone", card.add_work_phone),
+        ("home_phone", card.add_home_phone),
+        ("email", card.add_email),
+        ("url", card.add_url),
+        ("note", card.add_note),
+    ):
+        if value := fields.get(field):
+            add(value)
+
+    for kind, add in (("work", card.add_work_address), ("home", card.add_home_address)):
+        address = [fields.get(f"{kind}_{part}", "") for part in ADDRESS]
+        if any(address):
+            add(*address)
+    return card
+
+
+def read_contacts(
+    path: Path,
+    columns: Mapping[str, str] | None = None,
+    rev: datetime | bool = False,
+) -> Iterator[Record]:
+    """
+    Read contacts from a CSV or LDIF file, as records of vCards for `batch.generate_many`.
+
+    CSV columns are matched to the `FIELDS` by name or usual alias (`COLUMNS`), `columns`
+    maps other column names to fields. Records are named after their index and contact,
+    and are read one at a time. The cards have no revision unless `rev` is given.
+    """
+    if path.suffix.lower() not in (".csv", ".ldif"):
+        raise ValueError(f"Unsupported contacts format: {path.suffix!r}")
+
+    with path.open(newline="", encoding="utf-8-sig") as file:
+        contacts = _csv(file, columns or {}) if path.suffix.lower() == ".csv" else _ldif(file)
+        for index, fields in enumerate(contacts):
+            slug = re.sub(r"\W+", "-", f"{fields.get('surname', '')} {fields.get('name', '')}").strip("-").lower()
+            yield Record(name=f"{index:06d}-{slug}" if slug else f"{index:06d}", data=str(vcard(fields, rev)))
+
+
+def _key(column: str) -> str:
+    return re.sub(r"[\s-]+", "_", column.strip().lower())
+
+
+def _csv(file: TextIO, columns: Mapping[str, str]) -> Iterator[dict[str, str]]:
+    reader = csv.DictReader(file)
+    aliases = {**COLUMNS, **{field: field for field in FIELDS}, **{_key(k): v for k, v in columns.items()}}
+    if unknown := set(aliases.values()) - set(FIELDS):
+        raise ValueError(f"Unknown contact fields: {', '.join(sorted(unknown))}")
+
+    fields = {column: aliases[_key(column)] for column in reader.fieldnames or () if _key(column) in aliases}
+    for row in reader:
+        contact: dict[str, str] = {}
+        for column, field in fields.items():
+            if (value := (row.get(column) or "").strip()) and field not in contact:
+                contact[field] = value
+        yield contact
+
+
+def _ldif(file: TextIO) -> Iterator[dict[str, str]]:
+    for entry in _entries(file):
+        contact: dict[str, str] = {}
+        for attribute, value in entry:
+            if (field := LDIF.get(attribute)) and value and field not in contact:
+                contact[field] = value
+
+        # NOTE: Entries without given name and surname still have a common name
+        if "name" not in contact and "surname" not in contact and (name := dict(entry).get("cn")):
+            contact["name"] = name
+        if contact:
+            yield contact
+
+
+def _entries(lines: Iterable[str]) -> Iterator[list[tuple[str, str]]]:
+    """Attributes, in lowercase, and values of the LDIF entries, separated by blank lines."""
+    entry: list[tuple[str, str]] = []
+    for line in _unfold(lines):
+        if not line:
+            if entry:
+                yield entry
+            entry = []
+        elif (pair := _attribute(line)) is not None:
+            entry.append(pair)
+
+    if entry:
+        yield entry
+
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Join the lines continued on the next lines, starting with a space."""
+    logical: str | None = None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line.startswith(" ") and logical is not None:
+            logical += line[1:]
+            continue
+
+        if logical is not None:
+            yield logical
+        logical = line
+
+    if logical is not None:
+        yield logical
+
+
+def _attribute(line: str) -> tuple[str, str] | None:
+    """Attribute and value of a line, None for comments and values read from URLs."""
+    if line.startswith("#") or ":" not in line:
+        return None
+
+    name, value = line.split(":", 1)
+    if value.startswith(":"):
+        value = b64decode(value[1:].strip()).decode("utf-8")
+    elif value.startswith("<"):
+        return None
+    return name.split(";", 1)[0].lower(), value.strip()
@@ -1,60 +1,64 @@
 from __future__ import annotations
 
 import re
-from enum import IntEnum
+from enum import Enum, IntEnum
+from functools import lru_cache
 from types import MappingProxyType
-from typing import NamedTuple
+from typing import TYPE_CHECKING, NamedTuple
 
-from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+if TYPE_CHECKING:
+    import numpy as np
 
-FROM_PX = MappingProxyType(
+# NOTE: Pixels per unit, percentages are negative to tell them apart once converted
+PIXELS = MappingProxyType(
     {
-        "px": lambda x: x,
-        "pt": lambda x: x / 1.25,
-        "pc": lambda x: x / 15.0,
-        "in": lambda x: x / 90.0,
-        "mm": lambda x: x / 3.543307,
-        "cm": lambda x: x / 35.43307,
-        "%": lambda x: x * -100.0,
+        "px": 1.0,
+        "pt": 1.25,
+        "pc": 15.0,
+        "in": 90.0,
+        "mm": 3.543307,
+        "cm": 35.43307,
+        "%": -0.01,
     }
 )
 
-TO_PX = MappingProxyType(
-    {
-        "px": lambda x: x,
-        "pt": lambda x: x * 1.25,
-        "pc": lambda x: x * 15.0,
-        "in": lambda x: x * 90.0,
-        "mm": lambda x: x * 3.543307,
-        "cm": lambda x: x * 35.43307,
-        "%": lambda x: x / -100.0,
-    }
+UNIT = "mm"  # Default unit of the documents, one module is one unit
+
+LENGTH = re.compile(
+    rf"""
+        ^\s*
+        (?P<number>-?\d+(?:\.\d+)?)
+        \s*
+        (?P<unit>{"|".join(map(re.escape, PIXELS))})?
+    """,
+    re.VERBOSE,
 )
+SEPARATORS = re.compile(r"[ ,\t]+")
+
+
+@lru_cache(maxsize=1024)
+def length(value: str) -> tuple[float, str | None]:
+    """Number and unit, if any, of an SVG length."""
+    if not (parts := LENGTH.match(value)):
+        raise Exception(f'Unknown length format: "{value}"')
+    return float(parts["number"]), parts["unit"]
+
+
+def convert[Length: (float, np.ndarray)](value: Length, unit: str, to: str) -> Length:
+    """Convert a length, or a NumPy array of coordinates, between units."""
+    return value * (PIXELS[unit] / PIXELS[to])
 
 
 def _to_pixels(value: str, def_units="px") -> float:
     """Parses value as SVG length and returns it in pixels"""
-    size = re.compile(
-        rf"""
-            ^\s*
-            (?P<number>-?\d+(?:\.\d+)?)
-            \s*
-            (?P<unit>{'|'.join(TO_PX.keys())})?
-        """,
-        re.VERBOSE,
-    )
-
     if not value:
         return 0.0
 
-    if not (parts := size.match(value)):
-        raise Exception(f'Unknown length format: "{value}"')
-
+    number, unit = length(value)
     try:
-        unit = parts["unit"] or def_units
-        return TO_PX[unit](float(parts["number"]))
+        return number * PIXELS[unit or def_units]
     except KeyError as e:
-        raise Exception(f"Unknown length units: {parts['unit']}") from e
+        raise Exception(f"Unknown length units: {unit}") from e
 
 
 class ViewBox(NamedTuple):
@@ -68,9 +72,8 @@ class ViewBox(NamedTuple):
 
     @classmethod
     def from_string(cls, string: str) -> ViewBox | None:  # type: ignore
-        separators = re.compile(r"[ ,\t]+")
         try:
-            x, y, width, height = map(_to_pixels, separators.split(string.strip()))
+            x, y, width, height = map(_to_pixels, SEPARATORS.split(string.strip()))
         except ValueError:
             return None
 
@@ -89,8 +92,8 @@ class Size(NamedTuple):
     def from_string(cls, width: str, height: str, unit: str):
         w, h = map(_to_pixels, (width, height))
         return cls(
-            width=FROM_PX[unit](w),
-            height=FROM_PX[unit](h),
+            width=w / PIXELS[unit],
+            height=h / PIXELS[unit],
             unit=unit,
         )
 
@@ -101,10 +104,11 @@ class Offset(NamedTuple):
 
 
 class CorrectionLevel(IntEnum):
-    L = ERROR_CORRECT_L
-    M = ERROR_CORRECT_M
-    Q = ERROR_CORRECT_Q
-    H = ERROR_CORRECT_H
+    # NOTE: Values of `qrcode.constants`, not imported here as qrcode loads PIL
+    L = 1
+    M = 0
+    Q = 3
+    H = 2
 
     def __str__(self):
         return self.name
@@ -115,3 +119,39 @@ class CorrectionLevel(IntEnum):
             return CorrectionLevel[s.upper()]
         except KeyError as e:
             raise ValueError() from e
+
+
+class Shape(Enum):
+    CIRCLE = "circle"
+    SQUARE = "square"
+    ROUNDED = "rounded"
+
+    def __str__(self):
+        return self.value
+
+    @staticmethod
+    def from_string(s: str):
+        try:
+            return Shape(s.lower())
+        except ValueError as e:
+            raise ValueError() from e
+
+
+def validate_scale(value: str) -> float:
+    _value = float(value)
+    if 0.0 < _value <= 1.0:
+        return _value
+    raise ValueError("scale must be between 0 and 1")
+
+
+class Options(NamedTuple):
+    scale: float = 0.3
+    blur: float = 1
+    margin: int = 0
+    offset: Offset = Offset(0, 0)
+    error_correction: CorrectionLevel = CorrectionLevel.H
+    shape: Shape = Shape.CIRCLE
+    compact: bool = False
+    precision: int | None = None
+    min_margin: int | None = None
+    unit: str = UNIT
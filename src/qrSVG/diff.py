@@ -7,7 +7,6 @@ from pathlib import Path
 from xml.etree import ElementTree as ET
 
 from qrSVG.image import svg2pil
-from qrSVG.validate import read
 
 
 class Parser(Namespace):
@@ -64,5 +63,7 @@ def metadata():
         print(ET.tostring(logo).decode())
 
     if args.content:
+        from qrSVG.validate import read  # NOTE: OpenCV is slow to load and only needed here
+
         image = svg2pil(args.file, 2048, 2048)
         print(read(image))
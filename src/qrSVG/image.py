@@ -1,38 +1,324 @@
+from __future__ import annotations
+
+import math
+import re
+import sys
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from itertools import groupby
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from types import MappingProxyType
+from typing import TYPE_CHECKING
 from xml.etree import ElementTree as ET
 
-from cairosvg import svg2png
-from PIL import Image
-from qrcode.image.styles.moduledrawers import svg as SvgDrawer
-from qrcode.image.svg import SvgImage
-from qrcode.main import QRCode
+from qrSVG.containers import CorrectionLevel, Shape
+from qrSVG.lazy import Lazy
+from qrSVG.profile import profiled
 
-from qrSVG.containers import CorrectionLevel
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+    from qrcode.main import QRCode
 
+    Matrix = np.ndarray | list[list[bool]]  # NOTE: Nested lists are enough to draw square modules
+else:
+    np = Lazy("numpy")
 
-def svg2pil(path: Path, height: int, width: int) -> Image.Image:
-    """Convert SVG to PIL image."""
+# NOTE: Cairo stores premultiplied ARGB as native-endian 32-bit words
+RAWMODE = "BGRa" if sys.byteorder == "little" else "ARGB"
+BORDER = 4
 
-    with NamedTemporaryFile(suffix=".png", delete=False, delete_on_close=False) as tmp:
-        svg2png(
-            url=str(path),
-            write_to=tmp.name,
-            output_height=height,
-            output_width=width,
-        )
-        return Image.open(tmp.name)
+# NOTE: Shortest runs of digits or uppercase characters encoded in their own segment,
+# the first is the default of qrcode and is kept unless another gives a smaller version
+SEGMENTS = (20, 12, 8, 6, 4, 0)
 
+NAMESPACE = "http://www.w3.org/2000/svg"
+SVG = f"{{{NAMESPACE}}}svg"
+RECT = f"{{{NAMESPACE}}}rect"
+CIRCLE = f"{{{NAMESPACE}}}circle"
+PATH = f"{{{NAMESPACE}}}path"
+XML_DECLARATION = "<?xml version='1.0' encoding='us-ascii'?>\n"
 
-def data2tree(data: str, error_correction: CorrectionLevel) -> ET.Element:
-    """Data to QR SVG xml tree."""
-    qr = QRCode(
-        error_correction=error_correction.value,
-        border=4,
-    )
-    qr.add_data(data)
-    image = qr.make_image(
-        image_factory=SvgImage,
-        module_drawer=SvgDrawer.SvgCircleDrawer(),
+# NOTE: Characters escaped in attribute values, as `ET.tostring` does
+ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+SPECIAL = re.compile(f"[{''.join(ESCAPES)}]")
+
+# NOTE: Dots are drawn as strokes, a zero length line with round caps is a circle
+# and a half-module square with a half-module round-joined stroke is a rounded square
+DOTS = MappingProxyType(
+    {
+        Shape.CIRCLE: ("M{x}.5 {y}.5h0", {"stroke-width": "1", "stroke-linecap": "round"}),
+        Shape.ROUNDED: ("M{x}.25 {y}.25h.5v.5h-.5z", {"stroke-width": ".5", "stroke-linejoin": "round"}),
+    }
+)
+
+ET.register_namespace("", NAMESPACE)
+
+
+@profiled("rasterise", lambda image, *args, **kwargs: {"height": image.height, "width": image.width})
+def svg2pil(source: Path | bytes | ET.Element, height: int, width: int, base: Path | None = None) -> Image.Image:
+    """Convert SVG (file, bytes or xml tree) to PIL image, rendered in memory, `base` is the file of the bytes."""
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface
+    from PIL import Image
+
+    if isinstance(source, ET.Element):
+        source = ET.tostring(source)
+
+    # NOTE: Relative references of the bytes resolve against their file
+    if isinstance(source, bytes):
+        tree = Tree(bytestring=source, url=None if base is None else str(base))
+    else:
+        tree = Tree(url=str(source))
+    surface = PNGSurface(tree, None, 96, output_height=height, output_width=width)
+    surface.cairo.flush()
+    image = Image.frombuffer(
+        "RGBA",
+        (surface.cairo.get_width(), surface.cairo.get_height()),
+        bytes(surface.cairo.get_data()),
+        "raw",
+        RAWMODE,
+        surface.cairo.get_stride(),
+        1,
     )
-    return ET.fromstring(image.to_string())
+    surface.finish()
+    return image
+
+
+def fit(data: str, error_correction: CorrectionLevel) -> tuple[int, int]:
+    """
+    Smallest version the data fits in, and the shortest run split into its own segment to get it.
+
+    Numeric and alphanumeric segments take fewer bits than bytes, but every segment
+    has a header, so runs are only split out from a minimum length.
+    """
+    qr, minimum = _fit(data, error_correction)
+    return qr.version, minimum
+
+
+def _fit(data: str, error_correction: CorrectionLevel) -> tuple[QRCode, int]:
+    from qrcode.exceptions import DataOverflowError
+    from qrcode.main import QRCode
+
+    bound = lower_bound(data, error_correction)
+    best = None
+    for minimum in SEGMENTS:
+        qr = QRCode(error_correction=error_correction.value, border=BORDER)
+        qr.add_data(data, optimize=minimum)
+        try:
+            qr.best_fit()
+        except (DataOverflowError, ValueError) as e:
+            error = e  # NOTE: Too long, qrcode raises a ValueError past version 40
+            continue
+        if best is None or qr.version < best[0].version:
+            best = qr, minimum
+        if best[0].version <= bound:
+            break  # NOTE: No split can do better, most data stops at the default
+
+    if best is None:
+        raise error
+    return best
+
+
+def lower_bound(data: str, error_correction: CorrectionLevel) -> int:
+    """Smallest version any split of `SEGMENTS` could fit the data in, with a single header."""
+    from qrcode.util import ALPHA_NUM, BIT_LIMIT_TABLE
+
+    # NOTE: Only runs of the shortest split, or all the data, leave byte mode
+    raw = data.encode()
+    shortest = min(filter(None, SEGMENTS))
+    bits = 4.0
+    for cheap, group in groupby(raw, lambda byte: byte in ALPHA_NUM):
+        run = bytes(group)
+        if not cheap or (len(run) < shortest and run != raw):
+            bits += 8 * len(run)
+            continue
+        digits = sum(byte in b"0123456789" for byte in run)
+        bits += digits * 10 / 3 + (len(run) - digits) * 11 / 2
+    return bisect_left(BIT_LIMIT_TABLE[error_correction.value], math.ceil(bits), 1)
+
+
+@profiled("encode", lambda code, *args: {"version": code.version, "modules": code.modules_count})
+def encode(data: str, error_correction: CorrectionLevel) -> QRCode:
+    """Encode data as a QR code, in the smallest version (see `fit`)."""
+    qr, _ = _fit(data, error_correction)
+    qr.make(fit=False)
+    return qr
+
+
+def eyes(count: int, border: int = BORDER) -> np.ndarray:
+    """2D mask of the finder patterns ("eyes") of a matrix with `count` modules per side."""
+    index = np.arange(count) - border
+    modules = count - 2 * border
+    corner = (index >= 0) & (index < 7)  # noqa: PLR2004
+    far = (index < modules) & (modules - index < 8)  # noqa: PLR2004
+    return (corner[:, None] & (corner | far)[None, :]) | (far[:, None] & corner[None, :])
+
+
+def data2tree(data: str, error_correction: CorrectionLevel, shape: Shape = Shape.CIRCLE) -> ET.Element:
+    """Data to QR SVG xml tree."""
+    matrix = np.array(encode(data, error_correction).get_matrix(), dtype=bool)
+    return matrix2tree(matrix, shape)
+
+
+def root_attrib(side: int, unit: str = "mm", compact: bool = False) -> dict[str, str]:
+    """Attributes of the root `svg` element of a matrix with `side` modules per side."""
+    if compact:
+        return {"width": f"{side}{unit}", "height": f"{side}{unit}", "viewBox": f"0 0 {side} {side}"}
+    return {"width": f"{side}{unit}", "height": f"{side}{unit}", "version": "1.1"}
+
+
+def module_elements(
+    matrix: Matrix,
+    shape: Shape = Shape.CIRCLE,
+    unit: str = "mm",
+) -> Iterator[tuple[str, dict[str, str]]]:
+    """
+    Tag and attributes of an element per dark module, row by row.
+
+    Every module is 1 `unit` wide, the finder patterns are always drawn as squares.
+    Modules cleared in the matrix (e.g. knocked out by a logo) are never emitted.
+    Square modules are drawn without NumPy.
+    """
+    one, rounding = f"1{unit}", f"0.25{unit}"
+    eye = None if shape is Shape.SQUARE else eyes(len(matrix)).tolist()
+    for row, line in enumerate(_rows(matrix)):
+        for col, dark in enumerate(line):
+            if not dark:
+                continue
+
+            if eye is None or eye[row][col]:
+                yield RECT, {"x": f"{col}{unit}", "y": f"{row}{unit}", "width": one, "height": one}
+            elif shape is Shape.CIRCLE:
+                yield CIRCLE, {"cx": f"{col + 0.5:g}{unit}", "cy": f"{row + 0.5:g}{unit}", "r": f"0.5{unit}"}
+            else:
+                rect = {"x": f"{col}{unit}", "y": f"{row}{unit}", "width": one, "height": one}
+                yield RECT, {**rect, "rx": rounding, "ry": rounding}
+
+
+def path_elements(matrix: Matrix, shape: Shape = Shape.CIRCLE) -> Iterator[tuple[Iterator[str], dict[str, str]]]:
+    """
+    Path data, as an iterator of subpaths, and the other attributes of the compact paths.
+
+    One module is one user unit. Squares, including the finder patterns, are merged
+    into horizontal runs of a single path, other shapes are drawn by a second, stroked, path.
+    Square modules are drawn without NumPy.
+    """
+    if shape is Shape.SQUARE:
+        yield (f"M{x} {y}h{length}v1h-{length}z" for y, x, length in _runs(matrix)), {}
+        return
+
+    eye = eyes(len(matrix))
+    yield (f"M{x} {y}h{length}v1h-{length}z" for y, x, length in _runs(matrix & eye)), {}
+
+    template, style = DOTS[shape]
+    rows, cols = np.nonzero(matrix & ~eye)
+    dots = zip(cols.tolist(), rows.tolist(), strict=True)
+    yield (template.format(x=x, y=y) for x, y in dots), {"fill": "none", "stroke": "#000", **style}
+
+
+def _rows(matrix: Matrix) -> list[list[bool]]:
+    return matrix.tolist() if hasattr(matrix, "tolist") else matrix
+
+
+def _runs(matrix: Matrix) -> Iterator[tuple[int, int, int]]:
+    """Row, start and length of the horizontal runs of dark modules."""
+    for row, line in enumerate(_rows(matrix)):
+        col = 0
+        for dark, run in groupby(line):
+            length = sum(1 for _ in run)
+            if dark:
+                yield row, col, length
+            col += length
+
+
+def matrix2tree(matrix: Matrix, shape: Shape = Shape.CIRCLE, unit: str = "mm") -> ET.Element:
+    """Module matrix (border included) to SVG xml tree, see `module_elements`."""
+    root = ET.Element(SVG, root_attrib(len(matrix), unit))
+    for tag, attrib in module_elements(matrix, shape, unit):
+        ET.SubElement(root, tag, attrib)
+    return root
+
+
+def matrix2path(matrix: Matrix, shape: Shape = Shape.CIRCLE, unit: str = "mm") -> ET.Element:
+    """
+    Module matrix (border included) to a compact SVG xml tree, see `path_elements`.
+
+    The document is `len(matrix)` units wide and one module is one user unit.
+    """
+    root = ET.Element(SVG, root_attrib(len(matrix), unit, compact=True))
+    for data, attrib in path_elements(matrix, shape):
+        ET.SubElement(root, PATH, {"d": "".join(data), **attrib})
+    return root
+
+
+def stamp(shape: Shape, pixels: int) -> np.ndarray:
+    """Pixels covered by a module of `shape` drawn `pixels` wide."""
+    centre = np.abs((np.arange(pixels) + 0.5) / pixels - 0.5)
+    if shape is Shape.CIRCLE:
+        return centre[:, None] ** 2 + centre[None, :] ** 2 <= 0.25  # noqa: PLR2004
+    if shape is Shape.ROUNDED:
+        inner = np.maximum(centre - 0.25, 0)
+        return inner[:, None] ** 2 + inner[None, :] ** 2 <= 0.0625  # noqa: PLR2004
+    return np.ones((pixels, pixels), dtype=bool)
+
+
+def matrix2array(matrix: np.ndarray, shape: Shape = Shape.CIRCLE, pixels: int = 8) -> np.ndarray:
+    """Module matrix (border included) to a grayscale image, `pixels` per module, dark modules are black."""
+    square = np.ones((pixels, pixels), dtype=bool)
+    if shape is Shape.SQUARE:
+        dark = np.kron(matrix, square)
+    else:
+        eye = eyes(len(matrix))
+        dark = np.kron(matrix & eye, square) | np.kron(matrix & ~eye, stamp(shape, pixels))
+    return np.where(dark, 0, 255).astype(np.uint8)
+
+
+def iter_svg(
+    matrix: Matrix,
+    shape: Shape = Shape.CIRCLE,
+    unit: str = "mm",
+    compact: bool = False,
+    logos: Iterable[ET.Element] = (),
+) -> Iterator[str]:
+    """
+    Serialise the SVG document of a module matrix piece by piece, without building the xml tree.
+
+    The output matches `ET.tostring` of `matrix2tree`/`matrix2path` with the logos appended,
+    except that namespaces are declared on each logo instead of on the root.
+    """
+    if not compact:
+        yield XML_DECLARATION
+
+    yield f'<svg xmlns="{NAMESPACE}"{attributes(root_attrib(len(matrix), unit, compact))}>'
+    if compact:
+        for data, attrib in path_elements(matrix, shape):
+            yield '<path d="'
+            yield from data
+            yield f'"{attributes(attrib)} />'
+    else:
+        for tag, attrib in module_elements(matrix, shape, unit):
+            yield f"<{tag.removeprefix(f'{{{NAMESPACE}}}')}{attributes(attrib)} />"
+
+    for logo in logos:
+        yield ET.tostring(logo, encoding="unicode")
+    yield "</svg>"
+
+
+def attributes(attrib: dict[str, str]) -> str:
+    """Attributes of an element written by hand, escaped like `ET.tostring` does."""
+    return "".join(f' {key}="{_escape(value)}"' for key, value in attrib.items())
+
+
+def _escape(value: str) -> str:
+    """Escape an attribute value, numbers and units, most of the values, are searched but not copied."""
+    if SPECIAL.search(value) is None:
+        return value
+    return SPECIAL.sub(lambda match: ESCAPES[match[0]], value)
+
+
+def number(value: float, precision: int | None = None) -> str:
+    """Format a number with at most `precision` decimals, without trailing zeros."""
+    if precision is None:
+        return str(value)
+    return f"{value:.{precision}f}".rstrip("0").rstrip(".") or "0"
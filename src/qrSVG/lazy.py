@@ -0,0 +1,32 @@
+"""
+Deferred import of the heavy dependencies, to keep the start up of the CLI fast.
+
+NumPy is used throughout the modules, so they refer to it through a `Lazy` module:
+
+    if TYPE_CHECKING:
+        import numpy as np
+    else:
+        np = Lazy("numpy")
+
+Dependencies used in a single place (CairoSVG, OpenCV, inquirer...) are imported there.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any
+
+
+class Lazy:
+    """Module imported on first attribute access, the attributes are then kept on the instance."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._name!r})"
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(import_module(self._name), attribute)
+        setattr(self, attribute, value)
+        return value
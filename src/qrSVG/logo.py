@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from hashlib import sha256
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+from xml.etree import ElementTree as ET
+
+from qrSVG.containers import Size, ViewBox
+from qrSVG.image import svg2pil
+from qrSVG.lazy import Lazy
+from qrSVG.profile import profiled
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+else:
+    np = Lazy("numpy")
+
+RASTERS = 16  # Number of rasters kept per logo
+
+
+class Logo:
+    """
+    A parsed SVG logo, to be reused between QR codes.
+
+    The logo is parsed once, its rasters are cached per resolution and blur. Rasters
+    are rendered from `content`, the file is only used to resolve relative references.
+    """
+
+    def __init__(self, content: bytes, path: Path | None = None):
+        self.content = content
+        self.path = path
+        self.root = ET.fromstring(content)
+        self.digest = sha256(content).hexdigest()
+        self.viewbox = ViewBox.from_string(self.root.attrib.get("viewBox", ""))
+        self.size = self._size()
+        self._images: dict[tuple[int, int], Image.Image] = {}
+        self._rasters: dict[tuple[int, int, float], np.ndarray] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path or self.digest[:12]!r})"
+
+    @classmethod
+    def open(cls, source: Logo | Path | bytes | BinaryIO) -> Logo:
+        """Get a logo from a file path, SVG bytes or a binary file object."""
+        if isinstance(source, Logo):
+            return source
+
+        if isinstance(source, Path):
+            # NOTE: An edited file is parsed again
+            stat = source.stat()
+            return _from_path(source, stat.st_mtime_ns, stat.st_size)
+
+        if isinstance(source, bytes):
+            return cls(source)
+
+        return cls(source.read())
+
+    def image(self, height: int, width: int) -> Image.Image:
+        """Rasterise the logo, the image is cached and must not be modified."""
+        if (img := _recall(self._images, (height, width))) is not None:
+            return img
+
+        img = svg2pil(self.content, height=height, width=width, base=self.path)
+        _remember(self._images, (height, width), img)
+        return img
+
+    def raster(self, height: int, width: int, blur: float = 0) -> np.ndarray:
+        """Rasterise and blur the logo, summing the colour channels."""
+        key = (height, width, blur)
+        if (array := _recall(self._rasters, key)) is not None:
+            return array
+
+        array = _blur(self.image(height, width), blur)
+        array.flags.writeable = False
+        _remember(self._rasters, key, array)
+        return array
+
+    def _size(self) -> Size:
+        """Get the SVG logo size."""
+        try:
+            return Size.from_string(
+                width=self.root.attrib["width"],
+                height=self.root.attrib["height"],
+                unit="mm",
+            )
+        except KeyError as e:
+            if not self.viewbox:
+                raise Exception("No size information found in the SVG file") from e
+
+            return Size(
+                width=float(self.viewbox.width),
+                height=float(self.viewbox.height),
+                unit="mm",
+            )
+
+
+def _recall(cache: dict, key):
+    """Get a cached value, or None, and mark it as the most recently used."""
+    if (value := cache.pop(key, None)) is not None:
+        cache[key] = value
+    return value
+
+
+def _remember(cache: dict, key, value):
+    """Add to a cache holding the `RASTERS` most recently used values."""
+    cache[key] = value
+    if len(cache) > RASTERS:
+        del cache[next(iter(cache))]
+
+
+@profiled("blur", lambda array, *args: {"pixels": array.size})
+def _blur(img: Image.Image, radius: float) -> np.ndarray:
+    """Blur the image and sum its colour channels."""
+    from PIL import ImageFilter
+
+    return np.array(img.filter(ImageFilter.GaussianBlur(radius))).sum(axis=2)
+
+
+@lru_cache(maxsize=32)
+def _from_path(path: Path, mtime: int, size: int) -> Logo:
+    """Parse a logo file, its modification time and size only key the cache."""
+    return Logo(path.read_bytes(), path)
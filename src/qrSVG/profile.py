@@ -0,0 +1,97 @@
+"""
+Timing of the stages of the QR code generation.
+
+Stages report to the callbacks registered with `listen`, when there are none the
+instrumented functions are called directly.
+
+    with listen(print):
+        qr = QR("https://example.com")
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import NamedTuple, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_listeners: list[Callable[[Stage], None]] = []
+
+
+class Stage(NamedTuple):
+    name: str
+    duration: float  # seconds, including nested stages
+    details: dict[str, int]
+
+    def __str__(self) -> str:
+        details = " ".join(f"{key}={value}" for key, value in self.details.items())
+        return f"{self.name} {self.duration * 1000:.3f}ms {details}".rstrip()
+
+
+@contextmanager
+def listen(callback: Callable[[Stage], None]) -> Iterator[None]:
+    """Call `callback` with every stage that runs within the context."""
+    _listeners.append(callback)
+    try:
+        yield
+    finally:
+        _listeners.remove(callback)
+
+
+def log(stage: Stage):
+    """Callback logging the stages at debug level, e.g. `listen(log)`."""
+    import logging  # NOTE: Not needed unless profiling, and slow to import
+
+    logging.getLogger(__name__).debug("%s", stage)
+
+
+def profiled(name: str, details: Callable[..., dict[str, int]] | None = None):
+    """
+    Report the calls of the decorated function as a stage.
+
+    `details` is called with the result followed by the arguments of the call,
+    only when someone is listening.
+    """
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if not _listeners:
+                return func(*args, **kwargs)
+
+            start = perf_counter()
+            result = func(*args, **kwargs)
+            stage = Stage(name, perf_counter() - start, details(result, *args, **kwargs) if details else {})
+            for listener in _listeners:
+                listener(stage)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class Profile:
+    """Collect stages and summarise them per name."""
+
+    def __init__(self):
+        self.stages: list[Stage] = []
+
+    def __call__(self, stage: Stage):
+        self.stages.append(stage)
+
+    def __str__(self) -> str:
+        totals: dict[str, list[Stage]] = {}
+        for stage in self.stages:
+            totals.setdefault(stage.name, []).append(stage)
+
+        lines = [f"{'stage':<12} {'calls':>5} {'total':>12}  details"]
+        for name, stages in totals.items():
+            total = sum(stage.duration for stage in stages) * 1000
+            details = " ".join(f"{key}={value}" for key, value in stages[-1].details.items())
+            lines.append(f"{name:<12} {len(stages):>5} {total:>10.3f}ms  {details}")
+        return "\n".join(lines)
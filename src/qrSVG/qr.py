@@ -1,94 +1,403 @@
 from __future__ import annotations
 
-from functools import cached_property
+import copy
+import warnings
+from collections.abc import AsyncIterator, Iterator
+from functools import cached_property, lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
 from xml.etree import ElementTree as ET
 
-import numpy as np
-from PIL import ImageFilter
+from qrSVG.cache import MaskCache, MaskKey, OutputCache, output_key
+from qrSVG.codewords import Damage, damage
+from qrSVG.containers import PIXELS, UNIT, CorrectionLevel, Offset, Options, Shape, Size, convert
+from qrSVG.image import encode, eyes, iter_svg, matrix2array, matrix2path, matrix2tree, number
+from qrSVG.lazy import Lazy
+from qrSVG.logo import Logo
+from qrSVG.profile import profiled
 
-from qrSVG.containers import CorrectionLevel, Offset, Size, ViewBox
-from qrSVG.image import data2tree, svg2pil
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
 
-UNIT = "mm"  # TODO: This is not working with other units
+    from qrSVG.image import Matrix
+else:
+    np = Lazy("numpy")
+
+CHUNK_SIZE = 1 << 16
+SCALE_TOLERANCE = 0.01
+DAMAGE_PIXELS = 3  # Pixels per module of the image the damage is read from
+RASTER_DPI = 300
+
+# NOTE: Pillow formats of the raster outputs, by file extension
+RASTER_FORMATS = {".png": "PNG", ".webp": "WEBP"}
 
 
 class QR:
-    def __init__(self, data, error_correction: CorrectionLevel = CorrectionLevel.H):
+    mask_cache = MaskCache()
+
+    def __init__(
+        self,
+        data,
+        error_correction: CorrectionLevel = CorrectionLevel.H,
+        shape: Shape = Shape.CIRCLE,
+        unit: str = UNIT,
+    ):
+        if unit not in PIXELS or unit == "%":
+            raise ValueError(f"Unknown length units: {unit}")
+
         self._data = str(data)
-        self.tree = data2tree(self._data, error_correction)
+        self.version, self._matrix = _encode(self._data, error_correction)
+        self.error_correction = error_correction
+        self.shape = shape
+        self.unit = unit
+        self._logos: list[tuple[Logo, Offset, Size]] = []
+        self._steps: list[tuple] = []  # NOTE: Arguments of `add_logo`, to place the logos on other data
+        self._tree: ET.Element | None = None
+
+    @property
+    def tree(self) -> ET.Element:
+        """SVG xml tree of the QR code and its logos."""
+        if self._tree is None:
+            self._tree = self.build()
+        return self._tree
+
+    @profiled("build", lambda tree, *args, **kwargs: {"elements": len(tree)})
+    def build(self, compact: bool = False, precision: int | None = None) -> ET.Element:
+        """
+        Build the SVG xml tree.
+
+        A `compact` tree draws the modules as paths in a viewBox,
+        `precision` limits the decimals of the logo positions and sizes.
+        """
+        modules = self.kept()
+        tree = matrix2path(modules, self.shape, self.unit) if compact else matrix2tree(modules, self.shape, self.unit)
+        tree.extend(self._placed_logos(compact, precision))
+        return tree
+
+    @property
+    def data(self) -> str:
+        """Data encoded in the QR code."""
+        return self._data
+
+    @property
+    def logos(self) -> tuple[tuple[Logo, Offset, Size], ...]:
+        """Logos of the QR code, with their position and size in modules."""
+        return tuple(self._logos)
+
+    @cached_property
+    def modules(self) -> np.ndarray:
+        """2D mask of the dark modules, border included."""
+        modules = np.array(self._matrix, dtype=bool)
+        modules.flags.writeable = False
+        return modules
+
+    @cached_property
+    def knockout(self) -> np.ndarray:
+        """2D mask of the modules hidden by the logos."""
+        return np.zeros_like(self.modules)
 
     @cached_property
     def size(self) -> Size:
-        ET.register_namespace("", "http://www.w3.org/2000/svg")
-        root: ET.Element = self.tree.find(".")  # type: ignore
-        return Size.from_string(
-            height=root.attrib["height"],
-            width=root.attrib["width"],
-            unit=UNIT,
-        )
+        """Size of the QR code, border included, one module is one unit."""
+        side = float(len(self._matrix))
+        return Size(width=side, height=side, unit=self.unit)
+
+    @cached_property
+    def _dots(self) -> tuple[np.ndarray, np.ndarray]:
+        """Row and column of the dark modules that are not part of the finder patterns."""
+        return np.nonzero(self.modules & ~eyes(len(self.modules)))
+
+    def iter_bytes(
+        self,
+        compact: bool = False,
+        precision: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        Serialise the SVG document incrementally, in chunks of about `chunk_size` bytes.
+
+        The document is generated while it is consumed, the xml tree is never built.
+        """
+        modules = self.kept()
+        buffer: list[str] = []
+        length = 0
+        for text in iter_svg(modules, self.shape, self.unit, compact, self._placed_logos(compact, precision)):
+            buffer.append(text)
+            length += len(text)
+            if length >= chunk_size:
+                yield "".join(buffer).encode("ascii", "xmlcharrefreplace")
+                buffer.clear()
+                length = 0
+
+        if buffer:
+            yield "".join(buffer).encode("ascii", "xmlcharrefreplace")
+
+    async def aiter_bytes(
+        self,
+        compact: bool = False,
+        precision: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Asynchronous `iter_bytes`, giving control back to the event loop between chunks."""
+        import asyncio
+
+        for chunk in self.iter_bytes(compact, precision, chunk_size):
+            yield chunk
+            await asyncio.sleep(0)
+
+    @profiled("serialise", lambda _, qr, *args, **kwargs: qr._serialised())
+    def write_to(self, file: BinaryIO, compact: bool = False, precision: int | None = None):
+        """Stream the SVG document to a binary file-like object."""
+        for chunk in self.iter_bytes(compact, precision):
+            file.write(chunk)
+
+    @profiled("serialise", lambda content, qr, *args, **kwargs: {**qr._serialised(), "bytes": len(content)})
+    def to_bytes(self, compact: bool = False, precision: int | None = None) -> bytes:
+        """Serialise the SVG document, a `compact` document is minified (see `build`)."""
+        return b"".join(self.iter_bytes(compact, precision))
+
+    def save(  # noqa: PLR0913
+        self,
+        output: Path,
+        compact: bool = False,
+        precision: int | None = None,
+        size: int | None = None,
+        dpi: float | None = None,
+    ):
+        """Save SVG to given path, or a PNG or WebP image depending on its extension (see `to_image`)."""
+        if (kind := RASTER_FORMATS.get(output.suffix.lower())) is None:
+            with output.open("wb") as file:
+                self.write_to(file, compact, precision)
+            return
+
+        image = self.to_image(size, dpi)
+        resolution = image.width / convert(self.size.width, self.unit, "in")
+        # NOTE: WebP is written lossless, PNG ignores the option
+        image.save(output, kind, dpi=(resolution, resolution), lossless=True)
+
+    def damage(self) -> Damage:
+        """
+        Codewords damaged by the logos, dark modules knocked out and light modules drawn over dark.
+
+        The modules are read from an image of the code at `DAMAGE_PIXELS` per module.
+        """
+        return self._damage(self._logos)
+
+    def _damage(self, logos: list[tuple[Logo, Offset, Size]]) -> Damage:
+        if not logos:
+            return damage(self.knockout, self.version, self.error_correction)
+
+        # NOTE: A reader samples the centre of the modules
+        pixels = DAMAGE_PIXELS
+        dark = self._compose(pixels, "L", logos)[pixels // 2 :: pixels, pixels // 2 :: pixels, 0] < 128  # noqa: PLR2004
+        return damage(dark != self.modules, self.version, self.error_correction)
+
+    def to_array(self, pixels: int = 8) -> np.ndarray:
+        """
+        Grayscale image of the QR code, `pixels` per module.
+
+        The image is composed from the kept modules and the cached logo rasters,
+        without rendering the SVG document.
+        """
+        return self._compose(pixels, "L")[..., 0]
+
+    def to_image(self, size: int | None = None, dpi: float | None = None) -> Image.Image:
+        """
+        RGB image of the QR code, `size` pixels wide or at `dpi` (Default: `RASTER_DPI`).
+
+        Composed like `to_array`, at the next whole number of pixels per module, then
+        downsampled to the exact size.
+        """
+        from PIL import Image
 
-    def save(self, output: Path):
-        """Save SVG to given path."""
-        output.write_bytes(ET.tostring(self.tree, xml_declaration=True))  # type: ignore
+        if size is None:
+            size = round(convert(self.size.width, self.unit, "in") * (dpi or RASTER_DPI))
+        if size < 1:
+            raise ValueError(f"Invalid image size: {size}")
+
+        image = Image.fromarray(self._compose(-(-size // len(self._matrix)), "RGB"))
+        if image.width != size:
+            image = image.resize((size, size), Image.Resampling.BOX)
+        return image
+
+    @profiled("compose", lambda image, *args, **kwargs: {"pixels": image.shape[0] * image.shape[1]})
+    def _compose(self, pixels: int, mode: str, logos: list[tuple[Logo, Offset, Size]] | None = None) -> np.ndarray:
+        """
+        Image of the kept modules with the logos over them, `mode` is "L" or "RGB" (height, width, channels).
+
+        `logos` are drawn instead of the logos of the QR code, if given.
+        """
+        image = matrix2array(self.modules & ~self.knockout, self.shape, pixels).astype(np.float32)
+        image = np.repeat(image[..., None], len(mode), axis=2)
+        for logo, position, size in self._logos if logos is None else logos:
+            height, width = round(size.height * pixels), round(size.width * pixels)
+            y, x = round(position.y * pixels), round(position.x * pixels)
+            if height < 1 or width < 1:
+                continue
+            colour = np.array(logo.image(height, width).convert(f"{mode}A"), dtype=np.float32)
+            colour, alpha = colour[..., :-1], colour[..., -1:] / 255
+
+            # NOTE: A corrected position may move part of the logo off the code
+            top, left = max(y, 0), max(x, 0)
+            bottom, right = min(y + height, len(image)), min(x + width, len(image))
+            if top >= bottom or left >= right:
+                continue
+
+            area = (slice(top - y, bottom - y), slice(left - x, right - x))
+            region = image[top:bottom, left:right]
+            region[:] = region * (1 - alpha[area]) + colour[area] * alpha[area]
+        return image.round().astype(np.uint8)
+
+    def with_logo(  # noqa: PLR0913
+        self,
+        logo: Logo | Path | bytes | BinaryIO,
+        scale: float = 0.3,
+        blur: float = 1,
+        margin: int = 0,
+        offset: Offset = Offset(0, 0),  # noqa: B008
+        min_margin: int | None = None,
+    ) -> QR:
+        """
+        Copy of the QR code with one more logo (see `add_logo`), the QR code itself is left unchanged.
+
+        The copy shares the encoded modules, and the logo rasters and masks are cached, so
+        trying other scales, blurs or offsets on a base code only redoes the knockout.
+        """
+        qr = self._copy()
+        qr.add_logo(logo, scale, blur, margin, offset, min_margin)
+        return qr
+
+    def with_data(self, data) -> QR:
+        """QR code of other data, with the same options and logos placed the same way."""
+        qr = QR(data, self.error_correction, self.shape, self.unit)
+        for step in self._steps:
+            qr.add_logo(*step)
+        return qr
+
+    def _copy(self) -> QR:
+        """Copy of the QR code and its logos, sharing the encoded modules."""
+        qr = copy.copy(self)
+        if "knockout" in vars(self):
+            qr.knockout = self.knockout.copy()
+        qr._logos = list(self._logos)
+        qr._steps = list(self._steps)
+        qr._tree = None
+        return qr
+
+    def kept(self) -> Matrix:
+        """Dark modules that are drawn, NumPy is only needed once modules are knocked out."""
+        if "knockout" not in vars(self):
+            return self._matrix
+        return self.modules & ~self.knockout
+
+    def _serialised(self) -> dict[str, int]:
+        """Number of modules and logos written by the serialisation."""
+        return {"modules": int(np.count_nonzero(self.kept())), "logos": len(self._logos)}
+
+    def _placed_logos(self, compact: bool, precision: int | None) -> Iterator[ET.Element]:
+        """Logo elements positioned on the QR code."""
+        # NOTE: Inside the viewBox of a compact document one user unit is one module
+        unit = "" if compact else self.unit
+        for logo, position, size in self._logos:
+            element = ET.Element(logo.root.tag, logo.root.attrib)
+            element.attrib["width"] = f"{number(size.width, precision)}{unit}"
+            element.attrib["x"] = f"{number(position.x, precision)}{unit}"
+            element.attrib["height"] = f"{number(size.height, precision)}{unit}"
+            element.attrib["y"] = f"{number(position.y, precision)}{unit}"
+            element.text = logo.root.text
+            element.extend(logo.root)
+            yield element
 
     def add_logo(  # noqa: PLR0913
         self,
-        logo: Path,
+        logo: Logo | Path | bytes | BinaryIO,
         scale: float = 0.3,
         blur: float = 1,
         margin: int = 0,
         offset: Offset = Offset(0, 0),  # noqa: B008
+        min_margin: int | None = None,
     ):
-        """Add a logo to the center of the QR code."""
-        tree = ET.fromstring(logo.read_text())
-        root: ET.Element = tree.find(".")  # type: ignore
+        """
+        Add a logo (a `Logo`, file path, SVG bytes or binary file) to the center of the QR code.
+
+        With `min_margin` the logo is shrunk until at least that many codewords are left
+        to spare in every error correction block (see `damage`).
+        """
+        logo = Logo.open(logo)
+        step = (logo, scale, blur, margin, offset, min_margin)
+        knockout = self.knockout.copy()
+        size, _offset = self._place(logo, scale, blur, margin)
+
+        def placed(size: Size, _offset: Offset) -> list[tuple[Logo, Offset, Size]]:
+            return [*self._logos, (logo, Offset(_offset.x + offset.x, _offset.y + offset.y), size)]
+
+        if min_margin is not None and self._damage(placed(size, _offset)).margin < min_margin:
+            fitted = None
+            low, high = 0.0, scale
+            while high - low > SCALE_TOLERANCE:
+                scale = (low + high) / 2
+                self.knockout = knockout.copy()
+                size, _offset = self._place(logo, scale, blur, margin)
+                if self._damage(placed(size, _offset)).margin >= min_margin:
+                    low, fitted = scale, (size, _offset, self.knockout)
+                else:
+                    high = scale
 
-        size = self._logo_size(root, scale)
+            if fitted is None:
+                self.knockout = knockout
+                raise ValueError(f"No logo scale leaves {min_margin} codewords to spare")
+            size, _offset, self.knockout = fitted
+
+        # NOTE: Only the knocked out modules are checked, `damage` also rasterises the logos
+        if hits := damage(self.knockout, self.version, self.error_correction).function:
+            warnings.warn(
+                f"The logo damages {hits} modules of the timing or alignment patterns",
+                stacklevel=2,
+                skip_file_prefixes=(str(Path(__file__).parent),),
+            )
+
+        self._logos = placed(size, _offset)
+        self._steps.append(step)
+        self._tree = None
+
+    def _place(self, logo: Logo, scale: float, blur: float, margin: int) -> tuple[Size, Offset]:
+        """Knock out the modules under the centered logo, returns its size and position."""
+        size = self._logo_size(logo.size, scale)
 
         _offset = Offset(
             x=(self.size.width - size.width) / 2,
             y=(self.size.height - size.height) / 2,
         )
 
-        mask = self._logo_mask(logo, size, _offset, blur, margin)
-        self._mask_logo_intersection(mask)
-
-        root.attrib["width"] = f"{size.width}{UNIT}"
-        root.attrib["x"] = f"{_offset.x + offset.x}{UNIT}"
-        root.attrib["height"] = f"{size.height}{UNIT}"
-        root.attrib["y"] = f"{_offset.y+ offset.y}{UNIT}"
-        self.tree.append(root)
-
-    def _mask_logo_intersection(self, mask: np.ndarray):
-        """Remove nodes that intersect with the logo."""
-        mean = mask.mean()
-        nodes = self.tree.findall(".//svg:circle", namespaces={"svg": "http://www.w3.org/2000/svg"})
-        for node in reversed(nodes):
-            x, y, _ = Size.from_string(node.attrib["cx"], node.attrib["cy"], UNIT)
-            if mask[int(y - 1), int(x - 1)] > mean:  # type: ignore
-                self.tree.remove(node)
-
-    def _logo_size(self, node: ET.Element, scale: float) -> Size:
-        """Get the current SVG logo size."""
-        try:
-            size = Size.from_string(
-                width=node.attrib["width"],  # type: ignore
-                height=node.attrib["height"],  # type: ignore
-                unit="mm",
-            )
-        except KeyError as e:
-            viewbox = ViewBox.from_string(node.attrib.get("viewBox", ""))
+        if min(int(size.height), int(size.width)) + 2 * margin < 1:
+            return size, _offset  # NOTE: Nothing to rasterise, the logo is smaller than a module
 
-            if not viewbox:
-                raise Exception("No size information found in the SVG file") from e
+        key = MaskKey(logo.digest, size, blur, margin, self.version)
+        if (mask := self.mask_cache.get(key)) is None:
+            mask = self._logo_mask(logo, size, _offset, blur, margin)
+            self.mask_cache.put(key, mask)
+        self._mask_logo_intersection(mask, self._mask_origin(_offset, margin))
+        return size, _offset
 
-            size = Size(
-                width=float(viewbox.width),
-                height=float(viewbox.height),
-                unit="mm",
-            )
+    @profiled("knockout", lambda _, qr, *args: {"dots": len(qr._dots[0]), "knockout": int(qr.knockout.sum())})
+    def _mask_logo_intersection(self, mask: np.ndarray, origin: Offset):
+        """Knock out the modules that intersect with the logo, `origin` is the top left corner of the mask."""
+        rows, cols = self._dots
+        y, x = rows - 1 - int(origin.y), cols - 1 - int(origin.x)
+        inside = (y >= 0) & (y < mask.shape[0]) & (x >= 0) & (x < mask.shape[1])
+        hits = np.zeros_like(inside)
+        hits[inside] = mask[y[inside], x[inside]]
+        self.knockout[rows[hits], cols[hits]] = True
+        self._tree = None
+
+    @staticmethod
+    def _mask_origin(offset: Offset, margin: int) -> Offset:
+        """Top left corner of the mask of a logo placed at `offset`."""
+        return Offset(x=max(int(offset.x) - margin, 0), y=max(int(offset.y) - margin, 0))
 
+    def _logo_size(self, size: Size, scale: float) -> Size:
+        """Get the logo size scaled to the QR code."""
         # NOTE: We need to scale the logo to match the QR code size, as well as the scale factor
         qr_logo_scale = max(self.size.width, self.size.height) / max(size.width, size.height)
         _scale = scale * qr_logo_scale
@@ -97,25 +406,65 @@ class QR:
 
         return Size(width=width, height=height, unit=size.unit)
 
-    def _logo_mask(self, path: Path, logo: Size, offset: Offset, blur: float = 0, margin: int = 0) -> np.ndarray:  # noqa: PLR0913
-        """Create a 2D array to be used as image reference."""
-        img = svg2pil(
-            path=path,
-            height=int(logo.height) + 2 * margin,
-            width=int(logo.width) + 2 * margin,
-        )
-        blurred = img.filter(ImageFilter.GaussianBlur(blur))
+    @profiled("mask", lambda mask, *args, **kwargs: {"pixels": mask.size, "bytes": mask.nbytes})
+    def _logo_mask(self, logo: Logo, size: Size, offset: Offset, blur: float = 0, margin: int = 0) -> np.ndarray:  # noqa: PLR0913
+        """
+        Pixels of the logo darker than the mean of the QR code, one pixel per module.
 
-        array = np.array(blurred).sum(axis=2)
-        output = np.zeros((int(self.size.height), int(self.size.width)))
-        start = Offset(
-            x=int(offset.x) - margin,
-            y=int(offset.y) - margin,
+        Only the bounding box of the logo is kept, from `_mask_origin`. The mean is that
+        of the whole code, where the pixels outside of the logo are zero.
+        """
+        array = logo.raster(
+            height=int(size.height) + 2 * margin,
+            width=int(size.width) + 2 * margin,
+            blur=blur,
         )
-        y, x = array.shape
-        end = Offset(
-            x=start.x + x,
-            y=start.y + y,
-        )
-        output[start.y : end.y, start.x : end.x] = array  # type: ignore
-        return output
+        height, width = int(self.size.height), int(self.size.width)
+        top, left = int(offset.y) - margin, int(offset.x) - margin
+
+        # NOTE: Only the part of the logo on the code counts
+        visible = array[max(-top, 0) : height - top, max(-left, 0) : width - left]
+        return visible > visible.sum() / (height * width)
+
+
+@lru_cache(maxsize=64)
+def _encode(data: str, error_correction: CorrectionLevel) -> tuple[int, list[list[bool]]]:
+    """Version and module matrix of the data, shared between the QR codes and never modified."""
+    code = encode(data, error_correction)
+    return code.version, code.get_matrix()  # type: ignore
+
+
+def generate(
+    data,
+    logo: Logo | Path | bytes | BinaryIO | None = None,
+    options: Options = Options(),  # noqa: B008
+) -> QR:
+    """QR code with an optional logo, to be saved in several formats or sizes."""
+    qr = QR(data, options.error_correction, options.shape, options.unit)
+    if logo is not None:
+        qr.add_logo(logo, options.scale, options.blur, options.margin, options.offset, options.min_margin)
+    return qr
+
+
+def render(
+    data,
+    logo: Logo | Path | bytes | BinaryIO | None = None,
+    options: Options = Options(),  # noqa: B008
+    cache: OutputCache | None = None,
+) -> bytes:
+    """
+    Generate the SVG file of a QR code with an optional logo.
+
+    If a `cache` is given, repeated requests skip the QR code generation entirely.
+    """
+    logo = None if logo is None else Logo.open(logo)
+    if cache is not None:
+        key = output_key(str(data), logo.digest if logo else None, options)
+        if (content := cache.get(key)) is not None:
+            return content
+
+    content = generate(data, logo, options).to_bytes(options.compact, options.precision)
+
+    if cache is not None:
+        cache.put(key, content)
+    return content
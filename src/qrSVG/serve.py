@@ -0,0 +1,250 @@
+"""
+HTTP service generating QR codes with logos on demand.
+
+    GET /qr?data=DATA&logo=NAME    SVG file, options as query parameters (scale, shape...)
+    GET /metrics                   latencies, queue depth and counters, in the Prometheus text format
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+from qrSVG.batch import Record, generate_record, warm
+from qrSVG.cache import output_key
+from qrSVG.containers import CorrectionLevel, Options, Shape
+from qrSVG.logo import Logo
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# NOTE: Query parameters overriding the default options of the service
+QUERY: dict[str, Callable[[str], Any]] = {
+    "scale": float,
+    "blur": float,
+    "margin": int,
+    "error_correction": CorrectionLevel.from_string,
+    "shape": Shape.from_string,
+    "compact": lambda value: value.lower() in ("1", "true", "yes"),
+    "precision": int,
+    "min_margin": int,
+}
+
+
+class Busy(Exception):
+    """Too many QR codes are being generated already."""
+
+
+class Response(NamedTuple):
+    status: HTTPStatus
+    body: bytes
+    content_type: str = "text/plain; charset=utf-8"
+
+    @classmethod
+    def error(cls, status: HTTPStatus, message: str = "") -> Response:
+        return cls(status, f"{message or status.phrase}\n".encode())
+
+    def encode(self) -> bytes:
+        head = (
+            f"HTTP/1.1 {self.status.value} {self.status.phrase}\r\n"
+            f"Content-Type: {self.content_type}\r\n"
+            f"Content-Length: {len(self.body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        return head.encode("latin-1") + self.body
+
+
+class Histogram:
+    """Cumulative histogram of durations in seconds."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[index] += 1
+
+    def lines(self, name: str) -> Iterator[str]:
+        for bucket, count in zip(self.buckets, self.counts, strict=True):
+            yield f'{name}_bucket{{le="{bucket}"}} {count}'
+        yield f'{name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{name}_sum {self.sum}"
+        yield f"{name}_count {self.count}"
+
+
+class Service:
+    """
+    Generate QR codes over HTTP, on a pool of `workers` processes.
+
+    The logos are parsed when the service starts and are referred to by the stem of
+    their file name, the first one is the default. Identical requests in flight share
+    one generation, and requests beyond `max_pending` generations are refused.
+
+        async with Service([Path("logo.svg")]) as service:
+            server = await service.listen("127.0.0.1", 8000)
+            await server.serve_forever()
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        logos: Iterable[Path],
+        options: Options = Options(),  # noqa: B008
+        workers: int | None = None,
+        max_pending: int | None = None,
+        cache: Path | None = None,
+    ):
+        self.logos = {path.stem: path for path in logos}
+        if not self.logos:
+            raise ValueError("At least one logo is needed")
+
+        self.digests = {name: Logo.open(path).digest for name, path in self.logos.items()}
+        self.options = options
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 8 * self.workers
+        self.cache = cache
+        self.latency = Histogram()
+        self.responses: Counter[int] = Counter()
+        self.coalesced = 0
+        self._pending: dict[str, asyncio.Future[tuple[str, bytes]]] = {}
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def __aenter__(self) -> Service:
+        # NOTE: Forked workers would inherit, and keep open, the connections accepted so far
+        self._pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm,
+            initargs=(tuple(self.logos.values()), self.cache),
+        )
+        return self
+
+    async def __aexit__(self, *_):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def listen(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.Server:
+        """Accept connections, port 0 picks a free port."""
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def generate(self, data: str, logo: str, options: Options) -> bytes:
+        """Generate a QR code in the pool, sharing the result with identical requests in flight."""
+        key = output_key(data, self.digests[logo], options)
+        if (future := self._pending.get(key)) is None:
+            if len(self._pending) >= self.max_pending:
+                raise Busy
+
+            if self._pool is None:
+                raise RuntimeError("The service is not started, use it as `async with service:`")
+
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._pool, generate_record, Record(key, data), self.logos[logo], options)
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # NOTE: A client going away must not cancel the generation for the others
+        _, content = await asyncio.shield(future)
+        return content
+
+    def metrics(self) -> str:
+        lines = [
+            "# TYPE qrsvg_request_duration_seconds histogram",
+            *self.latency.lines("qrsvg_request_duration_seconds"),
+            "# TYPE qrsvg_responses_total counter",
+            *(f'qrsvg_responses_total{{status="{status}"}} {count}' for status, count in self.responses.items()),
+            "# TYPE qrsvg_coalesced_total counter",
+            f"qrsvg_coalesced_total {self.coalesced}",
+            "# TYPE qrsvg_queue_depth gauge",
+            f"qrsvg_queue_depth {len(self._pending)}",
+            "# TYPE qrsvg_workers gauge",
+            f"qrsvg_workers {self.workers}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    async def respond(self, request: str) -> Response:  # noqa: PLR0911
+        """Response to a request line, e.g. `GET /qr?data=hello HTTP/1.1`."""
+        try:
+            method, target, _ = request.split()
+        except ValueError:
+            return Response.error(HTTPStatus.BAD_REQUEST)
+
+        if method != "GET":
+            return Response.error(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        url = urlsplit(target)
+        if url.path == "/metrics":
+            return Response(HTTPStatus.OK, self.metrics().encode(), "text/plain; version=0.0.4")
+
+        if url.path != "/qr":
+            return Response.error(HTTPStatus.NOT_FOUND)
+
+        try:
+            data, logo, options = self._query(parse_qs(url.query))
+        except (KeyError, ValueError) as e:
+            return Response.error(HTTPStatus.BAD_REQUEST, f"Invalid query: {e}")
+
+        try:
+            content = await self.generate(data, logo, options)
+        except Busy:
+            return Response.error(HTTPStatus.SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response.error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+        return Response(HTTPStatus.OK, content, "image/svg+xml")
+
+    def _query(self, query: dict[str, list[str]]) -> tuple[str, str, Options]:
+        """Data, logo name and options of a parsed query string."""
+        if "data" not in query:
+            raise KeyError("data")
+
+        logo = query.get("logo", [next(iter(self.logos))])[-1]
+        if logo not in self.logos:
+            raise ValueError(f"unknown logo {logo!r}")
+
+        options = self.options._replace(**{key: parse(query[key][-1]) for key, parse in QUERY.items() if key in query})
+        return query["data"][-1], logo, options
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        start = time.perf_counter()
+        try:
+            try:
+                request = (await reader.readline()).decode("latin-1")
+                while (await reader.readline()).strip():
+                    continue  # NOTE: Headers are not used
+            except (ValueError, asyncio.LimitOverrunError):
+                # NOTE: A line over the limit of the stream, the rest of the request is not read
+                response = Response.error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            else:
+                response = await self.respond(request)
+            writer.write(response.encode())
+            await writer.drain()
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+
+        self.responses[response.status.value] += 1
+        self.latency.observe(time.perf_counter() - start)
+
+
+async def serve(service: Service, host: str = "127.0.0.1", port: int = 8000):
+    """Run the service until cancelled."""
+    async with service:
+        server = await service.listen(host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,198 @@
+"""
+Lay out many QR codes on print sheets, N-up pages as SVG files or a PDF document.
+
+Each logo is written once per page as a `symbol`, every code on the page refers to it.
+Pages are built and written one at a time, so the memory use does not grow with the
+number of codes.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from itertools import batched
+from pathlib import Path
+from typing import NamedTuple
+from xml.etree import ElementTree as ET
+
+from qrSVG.batch import sink
+from qrSVG.containers import Offset, convert
+from qrSVG.image import NAMESPACE, XML_DECLARATION, attributes, number, path_elements
+from qrSVG.logo import Logo
+from qrSVG.qr import QR
+
+# NOTE: Page sizes in mm, portrait
+PAGES = {
+    "a3": (297.0, 420.0),
+    "a4": (210.0, 297.0),
+    "a5": (148.0, 210.0),
+    "letter": (215.9, 279.4),
+    "legal": (215.9, 355.6),
+}
+
+PRECISION = 3  # Decimals of the positions on the page
+
+
+class Layout(NamedTuple):
+    """Grid of `columns` by `rows` codes on a page, all lengths in mm."""
+
+    width: float = PAGES["a4"][0]
+    height: float = PAGES["a4"][1]
+    columns: int = 4
+    rows: int = 6
+    margin: float = 10.0
+    gap: float = 5.0
+
+    @property
+    def per_page(self) -> int:
+        return self.columns * self.rows
+
+    @property
+    def cell(self) -> tuple[float, float]:
+        """Width and height of a cell of the grid."""
+        return (
+            (self.width - 2 * self.margin - (self.columns - 1) * self.gap) / self.columns,
+            (self.height - 2 * self.margin - (self.rows - 1) * self.gap) / self.rows,
+        )
+
+    @property
+    def side(self) -> float:
+        """Side of the codes, the largest square fitting in a cell."""
+        if min(self.columns, self.rows) < 1 or min(self.cell) <= 0:
+            raise ValueError(f"No room for the codes on the page: {self}")
+        return min(self.cell)
+
+    def cells(self) -> list[Offset]:
+        """Top left corner of the codes, row by row, centered in their cells."""
+        side = self.side
+        width, height = self.cell
+        return [
+            Offset(
+                x=self.margin + col * (width + self.gap) + (width - side) / 2,
+                y=self.margin + row * (height + self.gap) + (height - side) / 2,
+            )
+            for row in range(self.rows)
+            for col in range(self.columns)
+        ]
+
+
+class Sheet(NamedTuple):
+    codes: int
+    pages: int
+
+    def __str__(self) -> str:
+        return f"{self.codes} codes on {self.pages} pages"
+
+
+def symbol(logo: Logo) -> ET.Element:
+    """Definition of a logo referred to by the codes of a page, its id is derived from the digest."""
+    attrib = {key: value for key, value in logo.root.attrib.items() if key not in ("x", "y", "width", "height")}
+    if logo.viewbox is None:
+        width, height = (convert(side, logo.size.unit, "px") for side in (logo.size.width, logo.size.height))
+        attrib["viewBox"] = f"0 0 {number(width, PRECISION)} {number(height, PRECISION)}"
+
+    element = ET.Element(f"{{{NAMESPACE}}}symbol", {**attrib, "id": _id(logo)})
+    element.text = logo.root.text
+    element.extend(logo.root)
+    return element
+
+
+def _id(logo: Logo) -> str:
+    return f"logo-{logo.digest[:16]}"
+
+
+def iter_page(codes: list[QR], layout: Layout = Layout()) -> Iterator[str]:  # noqa: B008
+    """Serialise a page of codes piece by piece, the modules are drawn as compact paths."""
+    side = number(layout.side, PRECISION)
+    yield XML_DECLARATION
+    width, height = number(layout.width, PRECISION), number(layout.height, PRECISION)
+    yield f'<svg xmlns="{NAMESPACE}" width="{width}mm" height="{height}mm" viewBox="0 0 {width} {height}">'
+
+    logos = {logo.digest: logo for qr in codes for logo, *_ in qr.logos}
+    if logos:
+        yield "<defs>"
+        for logo in logos.values():
+            yield ET.tostring(symbol(logo), encoding="unicode")
+        yield "</defs>"
+
+    for qr, cell in zip(codes, layout.cells(), strict=False):
+        modules = qr.kept()
+        yield (
+            f'<svg x="{number(cell.x, PRECISION)}" y="{number(cell.y, PRECISION)}" width="{side}" height="{side}"'
+            f' viewBox="0 0 {len(modules)} {len(modules)}">'
+        )
+        for data, attrib in path_elements(modules, qr.shape):
+            yield '<path d="'
+            yield from data
+            yield f'"{attributes(attrib)} />'
+
+        # NOTE: One module is one user unit, as are the positions and sizes of the logos
+        for logo, position, size in qr.logos:
+            place = {
+                "x": position.x,
+                "y": position.y,
+                "width": size.width,
+                "height": size.height,
+            }
+            yield f'<use href="#{_id(logo)}"{attributes({k: number(v, PRECISION) for k, v in place.items()})} />'
+        yield "</svg>"
+    yield "</svg>"
+
+
+def pages(codes: Iterable[QR], layout: Layout = Layout()) -> Iterator[bytes]:  # noqa: B008
+    """SVG documents of the pages, only the codes of the current page are kept."""
+    for page in batched(codes, layout.per_page):
+        yield "".join(iter_page(list(page), layout)).encode("ascii", "xmlcharrefreplace")
+
+
+def write_sheet(codes: Iterable[QR], output: Path, layout: Layout = Layout()) -> Sheet:  # noqa: B008
+    """
+    Lay out the codes on pages, written to a PDF document if `output` ends with `.pdf`.
+
+    Otherwise the pages are written as SVG files to the `output` directory, or into
+    a zip file if `output` ends with `.zip`.
+    """
+    counted = 0
+
+    def count(codes: Iterable[QR]) -> Iterator[QR]:
+        nonlocal counted
+        for qr in codes:
+            counted += 1
+            yield qr
+
+    documents = pages(count(codes), layout)
+    if output.suffix.lower() == ".pdf":
+        total = _write_pdf(documents, output)
+        return Sheet(counted, total)
+
+    total = 0
+    with sink(output) as write:
+        for total, document in enumerate(documents, start=1):
+            write(f"page-{total:05d}", document)
+    return Sheet(counted, total)
+
+
+def _write_pdf(documents: Iterable[bytes], output: Path) -> int:
+    """Draw the SVG pages on the pages of a PDF document, returns the number of pages."""
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PDFSurface, cairo
+
+    document = None
+
+    class Page(PDFSurface):
+        """CairoSVG surface drawing on the current page of the shared document."""
+
+        def _create_surface(self, width: float, height: float):
+            nonlocal document
+            if document is None:
+                document = cairo.PDFSurface(str(output), width, height)
+            return document, width, height
+
+    total = 0
+    for content in documents:
+        Page(Tree(bytestring=content), None, dpi=96)
+        document.show_page()  # type: ignore
+        total += 1
+
+    if document is not None:
+        document.finish()
+    return total
@@ -13,6 +13,50 @@ except ImportError:
     )
     raise
 
+import os
+import warnings
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import cache
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+from xml.etree import ElementTree as ET
+
+from qrSVG.codewords import Damage
+from qrSVG.containers import CorrectionLevel, Offset, Shape, length
+from qrSVG.image import svg2pil
+from qrSVG.logo import Logo
+from qrSVG.qr import QR, SCALE_TOLERANCE
+
+# NOTE: Pixels per module tried in order, the first resolutions are much cheaper to render and decode
+MODULE_PIXELS = (4, 8, 16)
+MAX_RESOLUTION = 2048
+
+
+class Validation(NamedTuple):
+    name: str
+    expected: str
+    content: str  # decoded payload, empty if the code could not be read
+    resolution: int  # side in pixels of the last rendering tried
+
+    @property
+    def ok(self) -> bool:
+        return self.content == self.expected
+
+
+class ScaleSearch(NamedTuple):
+    scale: float
+    damage: Damage
+    validation: Validation
+
+
+@cache
+def _detector() -> QRCodeDetector:
+    """Detector shared by all validations of this process."""
+    return QRCodeDetector()
+
 
 def read(image: Image) -> str:
     """Validate that the QR code can be read."""
@@ -20,5 +64,130 @@ def read(image: Image) -> str:
     # if transparent make white
     img[img[:, :, 3] == 0] = (255, 255, 255, 255)
     qr = cvtColor(img, COLOR_RGBA2RGB)
-    content, *_ = QRCodeDetector().detectAndDecode(qr)
+    content, *_ = _detector().detectAndDecode(qr)
     return content
+
+
+def _gray(image: Image) -> np.ndarray:
+    """Grayscale of the image over a white background."""
+    luminance, alpha = np.moveaxis(np.array(image.convert("LA"), dtype=np.uint16), 2, 0)
+    return (255 - alpha * (255 - luminance) // 255).astype(np.uint8)
+
+
+def modules(svg: Path | bytes) -> int:
+    """Number of modules per side (border included) of a generated QR code, one module is one unit."""
+    source = svg if isinstance(svg, Path) else BytesIO(svg)
+    _, root = next(ET.iterparse(source, events=("start",)))
+    side, _ = length(root.attrib["width"])
+    return round(side)
+
+
+def validate(svg: Path | bytes, expected: str, name: str = "") -> Validation:
+    """
+    Check that a generated SVG file decodes to `expected`.
+
+    The code is rendered at a few pixels per module first and only at higher
+    resolutions when that does not decode.
+    """
+    side = modules(svg)
+    content, resolution = "", 0
+    for pixels in MODULE_PIXELS:
+        resolution = min(side * pixels, MAX_RESOLUTION)
+        content, *_ = _detector().detectAndDecode(_gray(svg2pil(svg, resolution, resolution)))
+        if content == expected or resolution == MAX_RESOLUTION:
+            break
+    return Validation(name, expected, content, resolution)
+
+
+def check(qr: QR, name: str = "", render: bool = False) -> Validation:
+    """
+    Check that a QR code decodes to its data.
+
+    The code is composed in NumPy from its modules and logo rasters (see `QR.to_array`),
+    with `render` the SVG document is rendered instead, for a slower but faithful check.
+    """
+    if render:
+        return validate(qr.to_bytes(), qr.data, name)
+
+    content, resolution = "", 0
+    for pixels in MODULE_PIXELS:
+        resolution = len(qr.modules) * pixels
+        content, *_ = _detector().detectAndDecode(qr.to_array(pixels))
+        if content == qr.data:
+            break
+    return Validation(name, qr.data, content, resolution)
+
+
+def _validate(item: tuple[str, Path | bytes, str]) -> Validation:
+    name, svg, expected = item
+    return validate(svg, expected, name)
+
+
+def validate_many(items: Iterable[tuple[str, Path | bytes, str]], workers: int | None = None) -> Iterator[Validation]:
+    """
+    Validate (name, SVG file or content, expected data) items over `workers` processes.
+
+    Results are yielded in the order of the items, which are consumed as the validation goes.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from map(_validate, items)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending: deque[Future[Validation]] = deque()
+        for item in items:
+            pending.append(pool.submit(_validate, item))
+            if len(pending) >= 4 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def optimize_logo(  # noqa: PLR0913
+    data,
+    logo: Logo | Path | bytes | BinaryIO,
+    error_correction: CorrectionLevel = CorrectionLevel.H,
+    shape: Shape = Shape.CIRCLE,
+    blur: float = 1,
+    margin: int = 0,
+    offset: Offset = Offset(0, 0),  # noqa: B008
+    min_margin: int = 0,
+    render: bool = False,
+    tolerance: float = SCALE_TOLERANCE,
+) -> ScaleSearch:
+    """
+    Find the largest logo scale, within `tolerance`, for which the QR code still decodes.
+
+    A scale is kept if at least `min_margin` codewords are left to spare in every block
+    (see `QR.damage`) and `check` decodes the code. Larger logos are assumed to never
+    decode if a smaller one does not, so the scale is binary searched. The data is encoded
+    once and the logo rasters and masks are cached between the tries.
+    """
+    logo = Logo.open(logo)
+    base = QR(data, error_correction, shape)
+
+    def attempt(scale: float) -> ScaleSearch | None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # NOTE: Only the scale found matters
+            qr = base.with_logo(logo, scale, blur, margin, offset)
+        if (spare := qr.damage()).margin < min_margin:
+            return None
+        validation = check(qr, render=render)
+        return ScaleSearch(scale, spare, validation) if validation.ok else None
+
+    if best := attempt(1.0):
+        return best
+
+    low, high = 0.0, 1.0
+    while high - low > tolerance:
+        scale = (low + high) / 2
+        if result := attempt(scale):
+            best, low = result, scale
+        else:
+            high = scale
+
+    if best is None:
+        raise Exception("No logo scale keeps the QR code readable")
+    return best
@@ -1,21 +1,46 @@
-from datetime import datetime
+from __future__ import annotations
+
+from datetime import UTC, datetime
 from itertools import chain
 
+from qrSVG.containers import CorrectionLevel
+
+
+def escape(value: str) -> str:
+    """Escape a text value, or a component of a structured value, e.g. `N` or `ADR`."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
 
 # https://www.evenx.com/vcard-3-0-format-specification
 # https://sv.wikipedia.org/wiki/V-card
+# https://datatracker.ietf.org/doc/html/rfc6350#section-3.4
 class VCard:
-    def __init__(self, name, surname):
+    """
+    Contact card, text values are escaped.
+
+    The revision (`REV`) is the time the card is written by default, a fixed `rev`
+    or `rev=False` to omit it give the same card, and QR code, every time.
+    """
+
+    def __init__(self, name, surname, rev: datetime | bool = True):
+        self.rev = rev
         self._bucket = [
-            f"N:{surname};{name}",
-            f"FN:{name} {surname}",
+            f"N:{escape(surname)};{escape(name)}",
+            f"FN:{escape(' '.join(filter(None, (name, surname))))}",
         ]
 
     def add_organization(self, organization):
-        self._bucket.append(f"ORG:{organization}")
+        self._bucket.append(f"ORG:{escape(organization)}")
 
     def add_title(self, title):
-        self._bucket.append(f"TITLE:{title}")
+        self._bucket.append(f"TITLE:{escape(title)}")
 
     def add_work_phone(self, number):
         self._bucket.append(f"TEL;TYPE=WORK,VOICE:{number}")
@@ -26,16 +51,16 @@ class VCard:
     def add_work_address(self, street, city, state, zip_code, country):  # noqa: PLR0913
         self._bucket.extend(
             [
-                f"ADR;TYPE=WORK:;;{street};{city};{state};{zip_code};{country}",
-                f"LABEL;TYPE=WORK:{street}\n{city}, {state} {zip_code}\n{country}",
+                f"ADR;TYPE=WORK:;;{';'.join(map(escape, (street, city, state, zip_code, country)))}",
+                f"LABEL;TYPE=WORK:{escape(f'{street}\n{city}, {state} {zip_code}\n{country}')}",
             ]
         )
 
     def add_home_address(self, address, city, state, zip_code, country):  # noqa: PLR0913
         self._bucket.extend(
             [
-                f"ADR;TYPE=HOME:;;{address};{city};{state};{zip_code};{country}",
-                f"LABEL;TYPE=HOME:{address}\n{city}, {state} {zip_code}\n{country}",
+                f"ADR;TYPE=HOME:;;{';'.join(map(escape, (address, city, state, zip_code, country)))}",
+                f"LABEL;TYPE=HOME:{escape(f'{address}\n{city}, {state} {zip_code}\n{country}')}",
             ]
         )
 
@@ -46,7 +71,14 @@ class VCard:
         self._bucket.append(f"URL:{website}")
 
     def add_note(self, note):
-        self._bucket.append(f"NOTE:{note}")
+        self._bucket.append(f"NOTE:{escape(note)}")
+
+    def version(self, error_correction: CorrectionLevel = CorrectionLevel.H) -> int:
+        """QR code version the card needs, in its smallest encoding (see `image.fit`)."""
+        from qrSVG.image import fit
+
+        version, _ = fit(str(self), error_correction)
+        return version
 
     def __str__(self):
         start = (
@@ -54,7 +86,16 @@ class VCard:
             "VERSION:3.0",
         )
         end = (
-            f"REV:{datetime.now().strftime("%Y%m%dT%H%M%SZ")}",
+            *self._rev(),
             "END:VCARD",
         )
         return "\n".join(chain(start, self._bucket, end))
+
+    def _rev(self) -> tuple[str, ...]:
+        if self.rev is False:
+            return ()
+
+        rev = datetime.now(UTC) if self.rev is True else self.rev
+        if rev.tzinfo is not None:
+            rev = rev.astimezone(UTC)
+        return (f"REV:{rev.strftime('%Y%m%dT%H%M%SZ')}",)
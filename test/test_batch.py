@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+
+import pytest
+from qrSVG.batch import Record, generate_many, read_job, read_records, run_jobs
+from qrSVG.containers import CorrectionLevel, Offset, Options, Shape
+from qrSVG.qr import QR
+
+LOGO = Path(__file__).parent / "svg" / "rick.svg"
+
+
+def test_read_records(tmp_path):
+    """Records are read from CSV and JSON-lines files."""
+    csv = tmp_path / "records.csv"
+    csv.write_text("name,data,logo\nfirst,https://example.com,\n,hello,logo.svg\n")
+    jsonl = tmp_path / "records.jsonl"
+    jsonl.write_text(
+        "\n".join(
+            json.dumps(row)
+            for row in ({"name": "first", "data": "https://example.com"}, {"data": "hello", "logo": "logo.svg"})
+        )
+    )
+
+    for path in (csv, jsonl):
+        first, second = read_records(path)
+        assert first == Record("first", "https://example.com")
+        assert second.name == "000001"
+        assert second.logo is not None and second.logo.name == "logo.svg"
+
+
+def test_generate_many(tmp_path):
+    """A cache is only used by its own run, duplicate names are refused."""
+    masks = QR.mask_cache
+    generate_many([("a", "hello")], LOGO, tmp_path / "cached", workers=1, cache=tmp_path / "cache")
+    assert QR.mask_cache is masks
+
+    files = sorted((tmp_path / "cache").rglob("*"))
+    assert list((tmp_path / "cache" / "masks").iterdir())
+    generate_many([("b", "world")], LOGO, tmp_path / "plain", workers=1)
+    assert sorted((tmp_path / "cache").rglob("*")) == files
+
+    with pytest.raises(ValueError, match="a.svg"):
+        generate_many([("a", "hello"), ("a.svg", "world")], LOGO, tmp_path / "twice.zip", workers=1)
+
+
+def test_read_job():
+    """Jobs override the default options and logo."""
+    job = read_job('{"data": "hello", "id": 7}', Options(scale=0.2), Path("logo.svg"))
+    assert (job.data, job.logo, job.output, job.options, job.id) == ("hello", Path("logo.svg"), None, Options(0.2), 7)
+
+    job = read_job(
+        json.dumps(
+            {
+                "data": "hello",
+                "logo": "other.svg",
+                "output": "out/hello.svg",
+                "options": {"shape": "square", "error_correction": "q", "offset": [1, 2]},
+            }
+        ),
+        logo=Path("logo.svg"),
+    )
+    assert job.logo == Path("other.svg") and job.output == Path("out/hello.svg")
+    assert job.options == Options(shape=Shape.SQUARE, error_correction=CorrectionLevel.Q, offset=Offset(1, 2))
+
+    for line in ('{"data": "hello"}', '{"data": "hello", "logo": "a.svg", "options": {"bogus": 1}}', "[]"):
+        with pytest.raises(ValueError):
+            read_job(line)
+
+    for options in ({"scale": 2}, {"scale": 0}, {"margin": 1.5}, {"shape": "star"}, {"error_correction": "x"}):
+        with pytest.raises(ValueError):
+            read_job(json.dumps({"data": "hello", "options": options}), logo=Path("logo.svg"))
+
+
+def test_run_jobs(tmp_path):
+    """Failing jobs yield errors, the caches of the run are not kept once it is over."""
+    masks = QR.mask_cache
+    lines = ['{"data": "hello", "id": 1}', "", "[]", '{"data": "hello", "options": {"scale": 2}}']
+    results = run_jobs(lines, logo=LOGO, cache=tmp_path)
+    first = next(results)
+    assert first["ok"] and first["id"] == 1 and first["svg"].startswith("<?xml")
+    assert QR.mask_cache is masks
+
+    failed = list(results)
+    assert [result["ok"] for result in failed] == [False, False]
+    assert failed[1]["error"] == "ValueError: scale must be between 0 and 1"
+    assert list((tmp_path / "masks").iterdir())
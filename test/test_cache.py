@@ -0,0 +1,79 @@
+import subprocess
+import sys
+
+import numpy as np
+from qrSVG.cache import DiskCache, MaskCache, MaskKey, MemoryCache, output_key
+from qrSVG.containers import CorrectionLevel, Options, Size
+
+KEY = MaskKey("logo", Size(9.0, 9.0, "mm"), 1.0, 0, 5)
+
+
+def test_output_key():
+    """Keys are stable and change with any input."""
+    key = output_key("data", "logo", Options())
+    assert key == output_key("data", "logo", Options())
+    assert key != output_key("data", None, Options())
+    assert key != output_key("data", "logo", Options(error_correction=CorrectionLevel.M))
+
+
+def test_memory_cache():
+    """The least recently used files are evicted."""
+    cache = MemoryCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == b"cccc"
+    assert cache.stats()[:3] == (2, 1, 2)
+
+
+def test_disk_cache(tmp_path):
+    """Files are shared between instances and evicted past the size limit."""
+    cache = DiskCache(tmp_path, max_bytes=10)
+    cache.put("aa", b"aaaa")
+    cache.put("bb", b"bbbb")
+    assert DiskCache(tmp_path).get("aa") == b"aaaa"
+
+    cache.put("cc", b"cccc")
+    assert cache.stats().entries == 2  # noqa: PLR2004
+
+
+def test_disk_cache_overwrite(tmp_path):
+    """Files written again are only counted once."""
+    cache = DiskCache(tmp_path, max_bytes=10)
+    for _ in range(3):
+        cache.put("aa", b"aaaa")
+    cache.put("bb", b"bbbb")
+    assert cache._size == cache.stats().size == 8  # noqa: PLR2004
+    assert cache.get("aa") == b"aaaa"
+
+
+def test_mask_key():
+    """Mask digests, naming the files on disk, are the same in every process."""
+    code = "from qrSVG.cache import MaskKey\nfrom qrSVG.containers import Size\n"
+    code += f"print(MaskKey(*{tuple(KEY)!r}).digest())"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True)
+    assert result.stdout.strip() == KEY.digest()
+    assert KEY.digest() != KEY._replace(version=6).digest()
+
+
+def test_mask_cache(tmp_path):
+    """The least recently used masks are evicted, masks on disk are read back by other caches."""
+    masks = [np.eye(3, dtype=bool), np.ones((2, 4), dtype=bool), np.zeros((1, 1), dtype=bool)]
+    keys = [KEY._replace(version=version) for version in range(3)]
+    cache = MaskCache(maxsize=2, directory=tmp_path)
+    cache.put(keys[0], masks[0])
+    cache.put(keys[1], masks[1])
+    assert cache.get(keys[0]) is masks[0]
+    cache.put(keys[2], masks[2])
+    assert len(cache) == 2  # noqa: PLR2004
+    assert keys[1] not in cache._masks and keys[0] in cache._masks
+
+    other = MaskCache(directory=tmp_path)
+    for key, mask in zip(keys, masks, strict=True):
+        loaded = other.get(key)
+        assert loaded is not None and loaded.dtype == bool and not loaded.flags.writeable
+        assert np.array_equal(loaded, mask)
+    assert MaskCache().get(keys[0]) is None
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from qrcode.main import QRCode
+from qrcode.util import mask_func
+from qrSVG.codewords import Damage, damage, layout, placement
+from qrSVG.containers import CorrectionLevel
+from qrSVG.qr import QR
+
+
+@pytest.mark.parametrize("version", [1, 7, 40])
+@pytest.mark.parametrize("error_correction", list(CorrectionLevel))
+def test_layout(version, error_correction):
+    """The codewords read back from the modules match the ones encoded by qrcode."""
+    code = QRCode(version=version, error_correction=error_correction.value, border=0)
+    code.add_data("qrSVG")
+    pattern = code.best_mask_pattern()
+    code.makeImpl(False, pattern)
+
+    modules = np.array(code.modules, dtype=bool)
+    mask = np.fromfunction(np.vectorize(mask_func(pattern)), modules.shape, dtype=int).astype(bool)
+    bits = placement(version)
+    _, owners, _ = layout(version, error_correction)
+
+    data = (modules ^ mask)[bits >= 0][np.argsort(bits[bits >= 0])][: 8 * len(owners)]
+    assert np.packbits(data).tolist() == list(code.data_cache)
+
+
+def test_damage():
+    """Removed modules are counted per block, and on the timing and alignment patterns."""
+    knockout = np.zeros((29, 29), dtype=bool)  # NOTE: Version 1 with the border
+    assert damage(knockout, 1, CorrectionLevel.H) == Damage((0,), (17,), 0, 1)
+
+    knockout[10, 12:14] = True  # NOTE: Timing pattern, row 6 without the border
+    knockout[4:6, 4] = True  # NOTE: Finder pattern, not counted
+    knockout[24, 24] = True  # NOTE: First bit of the first codeword
+    result = damage(knockout, 1, CorrectionLevel.H)
+    assert result == Damage((1,), (17,), 2, 1)
+    assert result.margin == 7  # noqa: PLR2004
+
+    # NOTE: Three of the seven correction codewords of version 1-L only detect errors
+    assert damage(knockout, 1, CorrectionLevel.L).capacity == (2,)
+    assert damage(np.zeros((33, 33), dtype=bool), 2, CorrectionLevel.M).protection == 0
+
+
+def test_qr_damage():
+    """Light modules drawn dark by a logo are damaged, even where nothing is knocked out."""
+    logo = b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"><rect width="10" height="10"/></svg>'
+    qr = QR("qrSVG").with_logo(logo, scale=0.3)
+    qr.knockout[:] = False
+    assert damage(qr.knockout, qr.version, qr.error_correction).damaged == (0,)
+    assert sum(qr.damage().damaged) > 0
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+from qrSVG.contacts import read_contacts
+
+
+def test_read_csv(tmp_path):
+    """CSV columns are matched by name, usual alias or explicit mapping."""
+    path = tmp_path / "contacts.csv"
+    path.write_text(
+        "First Name,Last-Name,E-mail,Cost Center,Business City\n"
+        'Forest,"Gump, Jr.",forest@example.com,Shrimp,Baytown\n'
+        ",,,,\n"
+    )
+    first, empty = read_contacts(path, {"cost center": "organization"})
+    assert first.name == "000000-gump-jr-forest"
+    lines = first.data.splitlines()
+    assert "N:Gump\\, Jr.;Forest" in lines
+    assert "EMAIL;TYPE=PREF,INTERNET:forest@example.com" in lines
+    assert "ORG:Shrimp" in lines
+    assert "ADR;TYPE=WORK:;;;Baytown;;;" in lines
+    assert not any(line.startswith("REV:") for line in lines)
+    assert empty.name == "000001"
+
+    with pytest.raises(ValueError, match="phone"):
+        list(read_contacts(path, {"cost center": "phone"}))
+
+
+def test_read_ldif(tmp_path):
+    """LDIF entries are unfolded and base64 values decoded."""
+    path = tmp_path / "contacts.ldif"
+    path.write_text(
+        "# export\n"
+        "dn: cn=Forest Gump,mail=forest@example.com\n"
+        "givenName: Forest\n"
+        "sn: Gump\n"
+        "description: Life is like a box\n"
+        "  of chocolates\n"
+        "\n"
+        "dn:: Y249SmVubnk=\n"
+        "cn:: SmVubnkgQ3VycmFu\n"
+        "jpegPhoto:< file:///tmp/jenny.jpg\n"
+    )
+    forest, jenny = read_contacts(path)
+    assert forest.name == "000000-gump-forest"
+    assert "NOTE:Life is like a box of chocolates" in forest.data.splitlines()
+    assert "FN:Jenny Curran" in jenny.data.splitlines()
+
+    with pytest.raises(ValueError, match="vcf"):
+        list(read_contacts(Path("contacts.vcf")))
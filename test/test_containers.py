@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from qrSVG.containers import Options, Size, ViewBox, _to_pixels, convert
+from qrSVG.qr import QR, generate
+
+
+def test_lengths():
+    """Lengths are parsed and converted through the table of pixels per unit."""
+    assert _to_pixels("10mm") == pytest.approx(35.43307)
+    assert _to_pixels(" 2.5 in") == 225  # noqa: PLR2004
+    assert _to_pixels("12", "pt") == 15  # noqa: PLR2004
+    assert _to_pixels("50%") == -0.5  # noqa: PLR2004
+    assert Size.from_string("90px", "1in", "mm")[:2] == pytest.approx((25.4, 25.4))
+    assert ViewBox.from_string("0,0 100\t50") == ViewBox(0, 0, 100, 50)
+
+    np.testing.assert_allclose(convert(np.array([0.0, 25.4, 50.8]), "mm", "in"), [0, 1, 2])
+    with pytest.raises(Exception, match="Unknown length"):
+        _to_pixels("ten")
+
+
+@pytest.mark.parametrize("unit", ["mm", "px", "in"])
+def test_unit(unit):
+    """One module is one unit of the document."""
+    qr = QR("hello", unit=unit)
+    assert qr.size == Size(29, 29, unit)
+    assert f'width="29{unit}"' in qr.to_bytes().decode()
+    assert generate("hello", options=Options(unit=unit)).size == qr.size
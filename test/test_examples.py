@@ -43,3 +43,16 @@ def test_example(example, monkeypatch, tmp_path):
     # Execute the module/example
     loader.exec_module(module)
     assert sentinel, "Save method was never called"
+
+
+@pytest.mark.parametrize("suffix", [".png", ".webp"])
+def test_save_image(suffix, tmp_path):
+    """Images are composed straight from the modules and decode."""
+    from PIL import Image
+
+    qr = QR("https://example.com")
+    qr.add_logo(Path(__file__).with_name("svg") / "logo.svg", scale=0.2)
+    qr.save(output := tmp_path / f"code{suffix}", size=300)
+    with Image.open(output) as image:
+        assert image.size == (300, 300)
+        assert read(image.convert("RGBA")) == "https://example.com"
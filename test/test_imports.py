@@ -0,0 +1,33 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = ("numpy", "cairosvg", "cv2", "inquirer")
+
+
+def loaded(code: str) -> list[str]:
+    """Heavy modules loaded by a fresh interpreter running `code`."""
+    report = f"import sys, json\nprint(json.dumps([name for name in {HEAVY!r} if name in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", f"{code}\n{report}"], capture_output=True, check=True, text=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        pytest.param("import qrSVG.vcard", id="vcard"),
+        pytest.param("import qrSVG.cli", id="cli"),
+        pytest.param(
+            "from qrSVG.containers import Options, Shape\n"
+            "from qrSVG.qr import render\n"
+            "render('https://example.com', options=Options(shape=Shape.SQUARE))\n"
+            "render('https://example.com', options=Options(shape=Shape.SQUARE, compact=True))",
+            id="square",
+        ),
+    ],
+)
+def test_lazy_imports(code):
+    """Heavy dependencies are only loaded when needed."""
+    assert loaded(code) == []
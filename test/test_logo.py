@@ -0,0 +1,40 @@
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+from qrSVG.image import svg2pil
+from qrSVG.logo import RASTERS, Logo
+
+LOGO = Path(__file__).with_name("svg") / "logo.svg"
+
+
+def test_open(tmp_path):
+    """Logo files are parsed once, and again once edited."""
+    path = tmp_path / "logo.svg"
+    path.write_bytes(LOGO.read_bytes())
+    logo = Logo.open(path)
+    assert Logo.open(path) is logo
+
+    path.write_bytes(LOGO.read_bytes().replace(b"<svg", b"<!-- edited --><svg", 1))
+    edited = Logo.open(path)
+    assert edited is not logo and edited.digest != logo.digest
+
+
+def test_rasters():
+    """The least recently used rasters are evicted."""
+    logo = Logo(LOGO.read_bytes())
+    first = logo.image(1, 1)
+    for size in range(2, RASTERS + 1):
+        logo.image(size, size)
+    assert logo.image(1, 1) is first
+
+    logo.image(RASTERS + 1, RASTERS + 1)
+    assert (1, 1) in logo._images and (2, 2) not in logo._images
+
+
+@pytest.mark.parametrize("source", [LOGO.read_bytes(), ET.parse(LOGO).getroot()], ids=["bytes", "element"])
+def test_svg2pil(source):
+    """SVG bytes and xml trees render like the file they were read from."""
+    image = svg2pil(source, height=64, width=48, base=LOGO)
+    assert image.size == (48, 64)
+    assert image.tobytes() == svg2pil(LOGO, height=64, width=48).tobytes()
@@ -0,0 +1,18 @@
+from qrSVG.profile import Profile, listen, profiled
+
+
+@profiled("double", lambda result, value: {"value": value})
+def double(value: int) -> int:
+    return 2 * value
+
+
+def test_profiled():
+    """Stages are reported only while listening."""
+    profile = Profile()
+    assert double(1) == 2  # noqa: PLR2004
+    with listen(profile):
+        assert double(2) == 4  # noqa: PLR2004
+    double(3)
+
+    assert [(stage.name, stage.details) for stage in profile.stages] == [("double", {"value": 2})]
+    assert str(profile).splitlines()[1].startswith("double           1")
@@ -0,0 +1,114 @@
+import asyncio
+import io
+import re
+import warnings
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+from qrSVG.containers import CorrectionLevel, Shape
+from qrSVG.image import SEGMENTS, attributes, encode, fit, lower_bound
+from qrSVG.qr import QR, generate
+
+LOGO = Path(__file__).with_name("svg") / "logo.svg"
+
+
+def elements(tree: ET.Element) -> list[tuple[str, dict[str, str], str]]:
+    return [(element.tag, element.attrib, (element.text or "").strip()) for element in tree.iter()]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_iter_bytes(compact):
+    """The streamed document has the elements of the xml tree, with and without logos."""
+    for qr in (QR("hello"), QR("hello").with_logo(LOGO)):
+        streamed = ET.fromstring(b"".join(qr.iter_bytes(compact)))
+        assert elements(streamed) == elements(ET.fromstring(ET.tostring(qr.build(compact))))
+
+    value = 'a "quoted" <b> & c\n'
+    assert ET.fromstring(f"<svg{attributes({'id': value})} />").get("id") == value
+
+
+def test_streaming():
+    """Chunks, streamed synchronously, asynchronously or to a file, make up the document."""
+    qr = QR("https://example.com").with_logo(LOGO)
+    for compact in (False, True):
+        content = qr.to_bytes(compact)
+        chunks = list(qr.iter_bytes(compact, chunk_size=256))
+        assert len(chunks) > 1 and b"".join(chunks) == content
+
+        async def collect(compact: bool = compact) -> list[bytes]:
+            return [chunk async for chunk in qr.aiter_bytes(compact, chunk_size=256)]
+
+        assert b"".join(asyncio.run(collect())) == content
+
+        file = io.BytesIO()
+        qr.write_to(file, compact)
+        assert file.getvalue() == content
+
+
+def covered(document: bytes) -> set[tuple[int, int]]:
+    """Row and column of the modules drawn by a plain or compact document."""
+    modules = set()
+    for element in ET.fromstring(document).iter():
+        if (x := element.get("x", element.get("cx"))) is not None:
+            y = element.get("y", element.get("cy", ""))
+            modules.add((int(float(y.removesuffix("mm"))), int(float(x.removesuffix("mm")))))
+        for col, row, run in re.findall(r"M(\d+)[.\d]* (\d+)[.\d]*h(\d*)", element.get("d", "")):
+            modules.update((int(row), int(col) + index) for index in range(max(int(run or 0), 1)))
+    return modules
+
+
+@pytest.mark.parametrize("shape", list(Shape))
+def test_compact(shape):
+    """Compact documents draw the same modules as plain ones."""
+    qr = QR("https://example.com", shape=shape)
+    modules = {(int(row), int(col)) for row, col in zip(*qr.modules.nonzero(), strict=True)}
+    assert covered(qr.to_bytes()) == modules
+    assert covered(qr.to_bytes(compact=True)) == modules
+
+
+def test_fit():
+    """Splitting shorter digit runs lowers the version, the search stops at the lower bound."""
+    from qrcode.main import QRCode
+
+    data = "name " + "; ".join(["123456789012345"] * 6)
+    default = QRCode(error_correction=CorrectionLevel.M.value)
+    default.add_data(data, optimize=SEGMENTS[0])
+    version, minimum = fit(data, CorrectionLevel.M)
+    assert minimum != SEGMENTS[0] and version < default.best_fit()
+    assert encode(data, CorrectionLevel.M).version == version
+
+    url = "https://example.com/some/path?id=12"
+    assert fit(url, CorrectionLevel.M) == (lower_bound(url, CorrectionLevel.M), SEGMENTS[0])
+
+
+def test_with_data():
+    """Codes of other data keep the options and share the encoding of equal data."""
+    qr = QR("hello", shape=Shape.SQUARE, unit="px")
+    other = qr.with_data("world")
+    assert (other.data, other.shape, other.unit) == ("world", Shape.SQUARE, "px")
+    assert QR("hello")._matrix is qr._matrix
+
+
+def test_with_logo():
+    """Logos are added to copies, the base code is left unchanged."""
+    base = QR("https://example.com")
+    small, large = base.with_logo(LOGO, scale=0.1), base.with_logo(LOGO, scale=0.3)
+    assert not base.knockout.any() and not base.logos
+    assert small.knockout.sum() < large.knockout.sum()
+
+    again = small.with_data("https://example.org")
+    assert again.logos[0][0] is small.logos[0][0]
+    assert again.knockout.any()
+
+
+def test_logo_warning():
+    """Only logos knocking out timing or alignment modules warn, at the calling code."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        QR("https://example.com").with_logo(LOGO, scale=0.2)
+        generate("https://example.com", LOGO)
+
+    with pytest.warns(UserWarning, match="timing or alignment") as record:
+        QR("https://example.com").with_logo(LOGO, scale=1)
+    assert record[0].filename == __file__
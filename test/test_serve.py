@@ -0,0 +1,79 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from qrSVG.serve import Service
+
+LOGO = Path(__file__).parent / "svg" / "rick.svg"
+
+
+async def get(port: int, target: str) -> tuple[int, bytes]:
+    """Minimal loopback HTTP client."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), body
+
+
+class Writer:
+    """Stream writer collecting the response."""
+
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data: bytes):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_oversized():
+    """A request line over the limit of the stream is refused, and the connection closed."""
+
+    async def scenario():
+        reader, writer = asyncio.StreamReader(limit=1024), Writer()
+        reader.feed_data(f"GET /qr?data={'x' * 2048} HTTP/1.1\r\n\r\n".encode())
+        reader.feed_eof()
+        await Service([LOGO], workers=1)._handle(reader, writer)  # type: ignore
+        assert writer.data.startswith(b"HTTP/1.1 413 ") and writer.closed
+
+    asyncio.run(scenario())
+
+
+def test_serve():
+    """QR codes are generated over HTTP, identical requests in flight are coalesced."""
+
+    async def scenario():
+        service = Service([LOGO], workers=1)
+        with pytest.raises(RuntimeError):
+            await service.generate("hello", "rick", service.options)
+
+        async with service:
+            # NOTE: The three tasks look up the pending generations before the first one can finish
+            contents = await asyncio.gather(*(service.generate("hello", "rick", service.options) for _ in range(3)))
+            assert len(set(contents)) == 1 and service.coalesced == 2  # noqa: PLR2004
+
+            server = await service.listen(port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                status, body = await get(port, "/qr?data=hello&logo=rick")
+                assert status == 200 and body == contents[0]  # noqa: PLR2004
+                assert body.startswith(b"<?xml")
+
+                assert (await get(port, "/qr?logo=rick"))[0] == 400  # noqa: PLR2004
+                assert (await get(port, "/qr?data=hello&shape=star"))[0] == 400  # noqa: PLR2004
+                assert (await get(port, "/nothing"))[0] == 404  # noqa: PLR2004
+
+                status, metrics = await get(port, "/metrics")
+                assert status == 200  # noqa: PLR2004
+                assert b"qrsvg_coalesced_total 2" in metrics
+                assert b"qrsvg_queue_depth 0" in metrics
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import contextlib
+import re
+import zipfile
+import zlib
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+from qrSVG.image import NAMESPACE
+from qrSVG.logo import Logo
+from qrSVG.qr import QR
+from qrSVG.sheet import Layout, iter_page, symbol, write_sheet
+
+
+def test_layout():
+    """Codes are centered in the cells of the grid."""
+    layout = Layout(width=100, height=60, columns=2, rows=1, margin=10, gap=10)
+    assert layout.side == 35  # noqa: PLR2004
+    assert [(cell.x, cell.y) for cell in layout.cells()] == [(10, 12.5), (55, 12.5)]
+
+    with pytest.raises(ValueError):
+        Layout(columns=100).side  # noqa: B018
+
+
+def test_sheet(tmp_path):
+    """Pages are written with one code per cell."""
+    summary = write_sheet((QR(str(i)) for i in range(7)), tmp_path / "sheet.zip", Layout(columns=2, rows=2))
+    assert (summary.codes, summary.pages) == (7, 2)
+
+    with zipfile.ZipFile(tmp_path / "sheet.zip") as archive:
+        assert archive.namelist() == ["page-00001.svg", "page-00002.svg"]
+        page = ET.fromstring(archive.read("page-00002.svg"))
+        assert len(page.findall(f"{{{NAMESPACE}}}svg")) == 3  # noqa: PLR2004
+
+
+def test_pdf(tmp_path):
+    """Pages are drawn on the pages of a single PDF document."""
+    output = tmp_path / "sheet.pdf"
+    summary = write_sheet((QR(str(i)) for i in range(7)), output, Layout(columns=2, rows=2))
+    assert (summary.codes, summary.pages) == (7, 2)
+
+    content = output.read_bytes()
+    assert content.startswith(b"%PDF")
+
+    # NOTE: Cairo may write the page objects in compressed object streams
+    objects = [content]
+    for stream in re.findall(rb"stream\r?\n(.*?)endstream", content, re.DOTALL):
+        with contextlib.suppress(zlib.error):
+            objects.append(zlib.decompressobj().decompress(stream))
+    assert len(re.findall(rb"/Type\s*/Page\b", b"".join(objects))) == summary.pages
+
+
+def test_symbol():
+    """Logos are defined once per page and referred to by their codes."""
+    logo = Logo.open(Path(__file__).with_name("svg") / "logo.svg")
+    definition = symbol(logo)
+    assert definition.get("id") and definition.get("viewBox")
+    assert len(definition) == len(logo.root)
+
+    page = "".join(iter_page([QR("hello")]))
+    assert "<defs>" not in page
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from qrSVG import validate
+from qrSVG.image import svg2pil
+from qrSVG.qr import QR
+from qrSVG.validate import MODULE_PIXELS, check, optimize_logo, validate_many
+
+DATA = "https://example.com"
+LOGO = Path(__file__).with_name("svg") / "logo.svg"
+
+
+def fake_renderer(qr: QR, readable: int, resolutions: list[int]):
+    """Stand in for `svg2pil`, drawing the code only from `readable` pixels on."""
+
+    def render(svg, height: int, width: int) -> Image.Image:
+        resolutions.append(height)
+        if height < readable:
+            return Image.new("RGBA", (width, height), "white")
+        return qr.to_image(height).convert("RGBA")
+
+    return render
+
+
+def test_validate_retries(monkeypatch):
+    """Codes are rendered again at more pixels per module until they decode."""
+    qr = QR(DATA)
+    side = len(qr.modules)
+    resolutions: list[int] = []
+    monkeypatch.setattr(validate, "svg2pil", fake_renderer(qr, side * MODULE_PIXELS[-1], resolutions))
+
+    result = validate.validate(qr.to_bytes(), DATA)
+    assert result.ok and result.resolution == side * MODULE_PIXELS[-1]
+    assert resolutions == [side * pixels for pixels in MODULE_PIXELS]
+
+
+def test_validate_max_resolution(monkeypatch):
+    """Codes are never rendered beyond the maximum resolution."""
+    qr = QR(DATA)
+    side = len(qr.modules)
+    resolutions: list[int] = []
+    monkeypatch.setattr(validate, "svg2pil", fake_renderer(qr, side * MODULE_PIXELS[-1], resolutions))
+    monkeypatch.setattr(validate, "MAX_RESOLUTION", side * MODULE_PIXELS[1] - 1)
+
+    result = validate.validate(qr.to_bytes(), DATA)
+    assert not result.ok and result.resolution == validate.MAX_RESOLUTION
+    assert resolutions == [side * MODULE_PIXELS[0], validate.MAX_RESOLUTION]
+
+
+def test_validate_many(tmp_path):
+    """Results come in the order of the items, whatever worker finishes first."""
+    items = []
+    for index in range(12):
+        # NOTE: Alternate large and small codes so later items are often done first
+        data = f"{DATA}/{index}" + "x" * 200 * (index % 2)
+        path = tmp_path / f"{index}.svg"
+        QR(data).save(path)
+        items.append((str(index), path, data))
+
+    results = list(validate_many(iter(items), workers=3))
+    assert [(result.name, result.expected) for result in results] == [(name, data) for name, _, data in items]
+
+
+def test_check():
+    """The image composed from the modules and logo rasters agrees with the rendered document."""
+    qr = QR(DATA).with_logo(LOGO, scale=0.2)
+    assert check(qr).ok and check(qr, render=True).ok
+
+    pixels = 8
+    side = len(qr.modules) * pixels
+    rendered = validate._gray(svg2pil(qr.to_bytes(), side, side))
+    assert np.mean((qr.to_array(pixels) < 128) != (rendered < 128)) < 0.05  # noqa: PLR2004
+
+
+def test_optimize_logo():
+    """The scale found decodes with codewords to spare, a scale larger by the tolerance does not."""
+    tolerance = 0.02
+    found = optimize_logo(DATA, LOGO, min_margin=1, tolerance=tolerance)
+    assert found.validation.ok and found.damage.margin >= 1
+    assert check(QR(DATA).with_logo(LOGO, found.scale)).ok
+
+    larger = QR(DATA).with_logo(LOGO, found.scale + tolerance)
+    assert larger.damage().margin < 1 or not check(larger).ok
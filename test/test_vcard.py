@@ -0,0 +1,35 @@
+from datetime import UTC, datetime, timedelta, timezone
+
+from qrSVG.containers import CorrectionLevel
+from qrSVG.vcard import VCard, escape
+
+
+def test_escape():
+    """Text values are escaped as in RFC 6350."""
+    assert escape("a\\b;c,d\ne") == "a\\\\b\\;c\\,d\\ne"
+
+    vcard = VCard("Forest", "Gump, Jr.", rev=False)
+    vcard.add_work_address("100 Waters Edge", "Baytown", "LA", "30314", "USA")
+    lines = str(vcard).splitlines()
+    assert "N:Gump\\, Jr.;Forest" in lines
+    assert "ADR;TYPE=WORK:;;100 Waters Edge;Baytown;LA;30314;USA" in lines
+    assert "LABEL;TYPE=WORK:100 Waters Edge\\nBaytown\\, LA 30314\\nUSA" in lines
+
+
+def test_rev():
+    """A fixed or omitted revision gives the same card every time."""
+    assert "REV:" not in str(VCard("Forest", "Gump", rev=False))
+
+    rev = datetime(2024, 1, 2, 5, 4, 5, tzinfo=timezone(timedelta(hours=2)))
+    assert "REV:20240102T030405Z" in str(VCard("Forest", "Gump", rev=rev))
+    assert str(VCard("Forest", "Gump", rev=rev)) == str(VCard("Forest", "Gump", rev=rev.astimezone(UTC)))
+
+
+def test_version():
+    """The version grows with the card and the error correction level."""
+    vcard = VCard("Forest", "Gump", rev=False)
+    small = vcard.version(CorrectionLevel.L)
+    assert small < vcard.version(CorrectionLevel.H)
+
+    vcard.add_note("life is like a box of chocolates" * 4)
+    assert vcard.version(CorrectionLevel.L) > small